@@ -6,18 +6,27 @@ import os
 import uvicorn
 from dotenv import load_dotenv
 
+from src.server import uvicorn_runtime
+
 # Load environment variables
 load_dotenv()
 
 # Get configuration from environment
 host = os.getenv("HOST", "0.0.0.0")
 port = int(os.getenv("PORT", "8080"))
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
 
 if __name__ == "__main__":
-    print(f"Starting server on {host}:{port}...")
+    runtime = uvicorn_runtime()
+    print(
+        f"Starting server on {host}:{port} "
+        f"(loop={runtime['loop']}, http={runtime['http']}, workers={workers})..."
+    )
     uvicorn.run(
         "src.app:app",
         host=host,
         port=port,
-        reload=False
+        workers=workers,
+        reload=False,
+        **runtime
     )
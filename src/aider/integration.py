@@ -1,20 +1,61 @@
 """
 Aider integration module.
 """
+import functools
+import hashlib
 import logging
 import os
-import subprocess
 import tempfile
-import json
 import re
-from typing import Dict, Any, List, Tuple, Optional
+from typing import Dict, Any, List, Set, Tuple, Optional
 import asyncio
+from collections import OrderedDict
 
 from src.config import config
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Prompts longer than this are passed to Aider in a file instead of on the command line
+MAX_INLINE_PROMPT_LENGTH = 100_000
+
+# Buffer limit for a single line of Aider output
+_OUTPUT_LINE_LIMIT = 16 * 1024 * 1024
+
+# Aider reports each file it changes on a line like: Edited 'file/path.py':
+_EDITED_FILE_RE = re.compile(rb"Edited '([^']+)':")
+_EDITED_LINE_RE = re.compile(r"Edited '([^']+)':$")
+
+# Recently built prompts, keyed by a hash of the issue content, so retries of
+# the same issue reuse the exact prompt Aider saw before
+_PROMPT_CACHE: "OrderedDict[str, str]" = OrderedDict()
+_PROMPT_CACHE_SIZE = 256
+
+
+def _prompt_cache_key(issue_details: Dict[str, Any]) -> str:
+    """Hash the issue fields that the Aider prompt is built from."""
+    content = "\0".join([
+        str(issue_details['number']),
+        issue_details['title'],
+        issue_details['body'] or "",
+        "\0".join(issue_details.get('file_paths') or []),
+        "\0".join(issue_details.get('error_messages') or []),
+    ])
+    return hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
+
+
+# Limits how many Aider processes run at the same time; created lazily so it
+# binds to the running event loop
+_aider_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _get_aider_semaphore() -> asyncio.Semaphore:
+    """Get the semaphore that caps concurrent Aider processes."""
+    global _aider_semaphore
+    if _aider_semaphore is None:
+        _aider_semaphore = asyncio.Semaphore(config.aider.max_concurrent)
+    return _aider_semaphore
+
 
 def prepare_aider_input(issue_details: Dict[str, Any]) -> str:
     """
@@ -26,33 +67,43 @@ def prepare_aider_input(issue_details: Dict[str, Any]) -> str:
     Returns:
         Prompt text for Aider
     """
-    prompt = f"# Issue #{issue_details['number']}: {issue_details['title']}\n\n"
+    key = _prompt_cache_key(issue_details)
+    if key in _PROMPT_CACHE:
+        _PROMPT_CACHE.move_to_end(key)
+        return _PROMPT_CACHE[key]
     
-    # Add issue description
-    prompt += "## Description\n"
-    prompt += issue_details['body']
-    prompt += "\n\n"
-    
-    # Add additional context
-    prompt += "## Analysis\n"
+    parts = [
+        f"# Issue #{issue_details['number']}: {issue_details['title']}\n\n",
+        # Add issue description
+        "## Description\n",
+        issue_details['body'],
+        "\n\n",
+        # Add additional context
+        "## Analysis\n",
+    ]
     
     if issue_details.get('file_paths'):
-        prompt += "### Affected files\n"
-        for file_path in issue_details['file_paths']:
-            prompt += f"- {file_path}\n"
-        prompt += "\n"
+        parts.append("### Affected files\n")
+        parts.extend(f"- {file_path}\n" for file_path in issue_details['file_paths'])
+        parts.append("\n")
     
     if issue_details.get('error_messages'):
-        prompt += "### Error messages\n"
-        for error in issue_details['error_messages']:
-            prompt += f"```\n{error}\n```\n"
-        prompt += "\n"
+        parts.append("### Error messages\n")
+        parts.extend(f"```\n{error}\n```\n" for error in issue_details['error_messages'])
+        parts.append("\n")
     
     # Add instructions for Aider
-    prompt += "## Instructions\n"
-    prompt += "Please fix this issue based on the description and analysis above. "
-    prompt += "Implement the minimal changes needed to resolve the problem. "
-    prompt += "After making changes, explain what you did and why.\n"
+    parts.append(
+        "## Instructions\n"
+        "Please fix this issue based on the description and analysis above. "
+        "Implement the minimal changes needed to resolve the problem. "
+        "After making changes, explain what you did and why.\n"
+    )
+    
+    prompt = "".join(parts)
+    _PROMPT_CACHE[key] = prompt
+    if len(_PROMPT_CACHE) > _PROMPT_CACHE_SIZE:
+        _PROMPT_CACHE.popitem(last=False)
     
     return prompt
 
@@ -82,13 +133,21 @@ def parse_aider_output(output: str) -> Tuple[Dict[str, str], str]:
     # @@ ... @@
     # ...
 
-    # Extract edited files sections
-    edit_sections = re.finditer(r"Edited '([^']+)':\n---.*?\n(.*?)(?:\n(?:Edited|$)|\Z)", 
-                               output, re.DOTALL)
+    # Extract edited files sections in one pass over the lines: each
+    # "Edited" line starts a section that runs until the next one
+    sections: List[Tuple[str, List[str]]] = []
+    for line in output.splitlines():
+        match = _EDITED_LINE_RE.match(line)
+        if match:
+            sections.append((match.group(1), []))
+        elif sections:
+            sections[-1][1].append(line)
     
-    for match in edit_sections:
-        file_path = match.group(1)
-        edit_content = match.group(2)
+    for file_path, edit_lines in sections:
+        # Skip the "--- a/..." header, the diff follows it
+        if edit_lines and edit_lines[0].startswith("---"):
+            edit_lines = edit_lines[1:]
+        edit_content = "\n".join(edit_lines)
         
         if file_path and edit_content:
             changes[file_path] = edit_content
@@ -107,58 +166,182 @@ def parse_aider_output(output: str) -> Tuple[Dict[str, str], str]:
     return changes, solution_description
 
 
-async def run_aider(input_file: str, files: List[str]) -> Tuple[int, str, str]:
-    """Run aider with the given input file and files to edit."""
-    # First log the model configuration
-    logger.info(f"Aider configuration:")
-    logger.info(f"  Model: {config.aider.model}")
-    logger.info(f"  API Key configured: {'Yes' if config.aider.api_key else 'No'}")
-    logger.info(f"  Provider: {'OpenAI' if config.aider.api_key else 'Unknown'}")
+@functools.lru_cache(maxsize=1)
+def _aider_env() -> Dict[str, str]:
+    """
+    Build the environment for Aider processes.
     
-    # Read the input file content
-    with open(input_file, 'r') as f:
-        message = f.read()
+    The API key is passed through the environment rather than on the command
+    line, where it would be visible in process listings and logs.
     
-    cmd = [
-        config.aider.binary_path,
-        "--model", config.aider.model,
-        "--no-git",  # Don't use git features since we handle that
-        "--message", message,  # Use --message instead of --message-file
-        "--yes",  # Auto-confirm changes
-    ]
-
-    # Add API key in the correct format
+    Returns:
+        Environment variables for Aider
+    """
+    env = dict(os.environ)
     if config.aider.api_key:
-        cmd.extend(["--api-key", f"openai={config.aider.api_key}"])
+        env["OPENAI_API_KEY"] = config.aider.api_key
+    return env
+
+
+async def _collect_output(process: asyncio.subprocess.Process) -> Tuple[bytes, bytes]:
+    """
+    Stream Aider's stdout line by line while collecting stderr.
+    
+    Edited files are logged as soon as Aider reports them, so long runs
+    show progress instead of staying silent until Aider exits.
+    
+    Args:
+        process: Running Aider process
+    
+    Returns:
+        Tuple of (stdout, stderr)
+    """
+    stderr_task = asyncio.ensure_future(process.stderr.read())
+    stdout = bytearray()
+    try:
+        async for line in process.stdout:
+            stdout += line
+            match = _EDITED_FILE_RE.match(line)
+            if match:
+                logger.info(f"Aider edited {match.group(1).decode(errors='replace')}")
+        stderr = await stderr_task
+    finally:
+        stderr_task.cancel()
+    
+    await process.wait()
+    return bytes(stdout), stderr
 
-    # Add files at the end
-    cmd.extend(files)
 
-    logger.info(f"Running aider command: {' '.join(cmd)}")
+async def run_aider(message: str, files: List[str], cwd: str) -> Tuple[int, str, str]:
+    """
+    Run Aider with the given message on the given files.
+    
+    Args:
+        message: Prompt for Aider
+        files: Files Aider may edit, relative to cwd
+        cwd: Working directory to run Aider in
     
+    Returns:
+        Tuple of (return_code, stdout, stderr)
+    """
+    # First log the model configuration
+    logger.info(f"Aider configuration:")
+    logger.info(f"  Model: {config.aider.model}")
+    logger.info(f"  API Key configured: {'Yes' if config.aider.api_key else 'No'}")
+    logger.info(f"  Provider: {'OpenAI' if config.aider.api_key else 'Unknown'}")
+    
+    prompt_file = None
     try:
-        process = await asyncio.create_subprocess_exec(
-            *cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
+        cmd = [
+            config.aider.binary_path,
+            "--model", config.aider.model,
+        ]
+        
+        # Pass the message on the command line unless it risks exceeding the
+        # OS argument length limit, in which case hand it over in a file
+        if len(message) > MAX_INLINE_PROMPT_LENGTH:
+            with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.md') as f:
+                prompt_file = f.name
+                f.write(message)
+            logger.info(f"Prompt too long for the command line, created prompt file: {prompt_file}")
+            cmd.extend(["--message-file", prompt_file])
+        else:
+            cmd.extend(["--message", message])
+        
+        cmd.extend([
+            "--yes",  # Auto-apply changes
+            "--no-git",  # Don't make git commits, we handle that
+        ])
+        
+        if not config.aider.api_key:
+            logger.warning("No OpenAI API key configured")
+        
+        # Add files at the end
+        cmd.extend(files)
         
-        stdout, stderr = await process.communicate()
+        # Don't log the command itself, it contains the whole prompt
+        logger.info(f"Running Aider with {len(files)} files (model={config.aider.model})")
+        logger.info(f"Working directory: {cwd}")
+        
+        # Each Aider process can use gigabytes of memory, so cap how many run at once
+        semaphore = _get_aider_semaphore()
+        if semaphore.locked():
+            logger.info("Waiting for a free Aider slot")
+        
+        async with semaphore:
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                cwd=cwd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                env=_aider_env(),
+                limit=_OUTPUT_LINE_LIMIT
+            )
+            
+            # Stream output with timeout, without blocking the event loop
+            timed_out = False
+            try:
+                stdout, stderr = await asyncio.wait_for(
+                    _collect_output(process),
+                    timeout=600  # 10 minutes timeout
+                )
+            except asyncio.TimeoutError:
+                timed_out = True
+            finally:
+                # Don't leave Aider running on a timeout, a failure to read its
+                # output, or when the job is cancelled
+                if process.returncode is None:
+                    try:
+                        process.kill()
+                    except ProcessLookupError:
+                        pass
+                    await process.wait()
+            
+            if timed_out:
+                logger.error("Aider timed out after 600 seconds")
+                return process.returncode, "", "Aider timed out after 600 seconds"
+        
+        stderr_text = stderr.decode(errors="replace")
         
         # Log any model information from stderr
-        if stderr:
-            stderr_text = stderr.decode()
-            if "Using model:" in stderr_text:
-                logger.info(f"Aider reported: {stderr_text.split('Using model:')[1].strip()}")
+        if "Using model:" in stderr_text:
+            logger.info(f"Aider reported: {stderr_text.split('Using model:')[1].strip()}")
         
-        return (
-            process.returncode,
-            stdout.decode() if stdout else "",
-            stderr.decode() if stderr else ""
-        )
+        return process.returncode, stdout.decode(errors="replace"), stderr_text
+    
     except Exception as e:
         logger.exception("Failed to run aider")
         return 1, "", str(e)
+    
+    finally:
+        # Clean up the temp file
+        if prompt_file and os.path.exists(prompt_file):
+            os.unlink(prompt_file)
+            logger.debug(f"Cleaned up prompt file: {prompt_file}")
+
+
+async def _list_tracked_files(repo_path: str) -> Set[str]:
+    """
+    List the files tracked in a repository.
+    
+    Args:
+        repo_path: Path to the repository
+    
+    Returns:
+        Set of tracked file paths, relative to the repository root
+    """
+    process = await asyncio.create_subprocess_exec(
+        "git", "-C", repo_path, "ls-files", "-z",
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    stdout, stderr = await process.communicate()
+    
+    if process.returncode != 0:
+        logger.error(f"Failed to list files in {repo_path}: {stderr.decode(errors='replace')}")
+        return set()
+    
+    return {path for path in stdout.decode(errors="replace").split("\0") if path}
 
 
 async def run_aider_on_issue(
@@ -170,6 +353,12 @@ async def run_aider_on_issue(
     Run Aider on an issue to generate fixes.
     Returns (success, changes, solution_description)
     """
+    # Running Aider is by far the most expensive step, only do it for issues
+    # the analyzer considers fixable
+    if not issue_details.get("is_fixable", False):
+        logger.info(f"Issue #{issue_details['number']} is not fixable, not running Aider")
+        return False, {}, None
+    
     logger.info(f"Running Aider on issue #{issue_details['number']}")
     logger.info(f"Repository path: {repo_path}")
     
@@ -178,21 +367,24 @@ async def run_aider_on_issue(
         logger.error(f"Repository path does not exist or is not a directory: {repo_path}")
         return False, {}, None
         
-    # Verify it's a git repository
-    if not os.path.isdir(os.path.join(repo_path, ".git")):
+    # Verify it's a git repository (.git is a file in a linked worktree)
+    if not os.path.exists(os.path.join(repo_path, ".git")):
         logger.error(f"Path is not a git repository: {repo_path}")
         return False, {}, None
         
     logger.info(f"Repository verified at {repo_path}")
     
+    # List tracked files once instead of checking each candidate on disk
+    tracked_files = await _list_tracked_files(repo_path)
+    
     # Get target files
     target_files = []
     
     # First try files mentioned in the issue
     if issue_details.get('file_paths'):
         for file_path in issue_details['file_paths']:
-            full_path = os.path.join(repo_path, file_path)
-            if os.path.exists(full_path):
+            file_path = os.path.normpath(file_path)
+            if file_path in tracked_files:
                 target_files.append(file_path)
                 logger.info(f"Adding target file from issue: {file_path}")
     
@@ -205,8 +397,7 @@ async def run_aider_on_issue(
     if not target_files:
         default_files = ["package.json"]  # Add more defaults as needed
         for file_path in default_files:
-            full_path = os.path.join(repo_path, file_path)
-            if os.path.exists(full_path):
+            if file_path in tracked_files:
                 target_files.append(file_path)
                 logger.info(f"Using default file: {file_path}")
     
@@ -218,52 +409,10 @@ async def run_aider_on_issue(
     
     # Prepare the input prompt
     prompt = prepare_aider_input(issue_details)
-    
-    # Create a temp file for the prompt
-    with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.md') as f:
-        prompt_file = f.name
-        f.write(prompt)
-        logger.info(f"Created prompt file: {prompt_file}")
+    logger.debug(f"Prompt content:\n{prompt}")
     
     try:
-        # Read the prompt content
-        with open(prompt_file, 'r') as f:
-            prompt_content = f.read()
-            logger.debug(f"Prompt content:\n{prompt_content}")
-        
-        # Build the Aider command
-        cmd = [
-            config.aider.binary_path,
-            "--model", config.aider.model,
-            "--message", prompt_content,
-            "--yes",  # Auto-apply changes
-            "--no-git",  # Don't make git commits
-        ]
-        
-        # Add API key in the correct format
-        if config.aider.api_key:
-            cmd.extend(["--api-key", f"openai={config.aider.api_key}"])
-        else:
-            logger.warning("No OpenAI API key configured")
-        
-        # Add files at the end
-        cmd.extend(target_files)
-        
-        # Run Aider
-        logger.info(f"Running Aider command: {' '.join(cmd)}")
-        logger.info(f"Working directory: {repo_path}")
-        
-        process = subprocess.Popen(
-            cmd,
-            cwd=repo_path,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            env=os.environ.copy()  # Ensure we pass through environment variables
-        )
-        
-        # Get output with timeout
-        stdout, stderr = process.communicate(timeout=600)  # 10 minutes timeout
+        returncode, stdout, stderr = await run_aider(prompt, target_files, repo_path)
         
         # Log all output
         if stdout:
@@ -272,8 +421,8 @@ async def run_aider_on_issue(
             logger.info(f"Aider stderr:\n{stderr}")
         
         # Check if Aider succeeded
-        if process.returncode != 0:
-            logger.error(f"Aider failed with exit code {process.returncode}")
+        if returncode != 0:
+            logger.error(f"Aider failed with exit code {returncode}")
             if stderr:
                 logger.error(f"Stderr: {stderr}")
             if stdout:
@@ -299,9 +448,3 @@ async def run_aider_on_issue(
     except Exception as e:
         logger.exception(f"Error running Aider: {e}")
         return False, {}, None
-    
-    finally:
-        # Clean up the temp file
-        if os.path.exists(prompt_file):
-            os.unlink(prompt_file)
-            logger.debug(f"Cleaned up prompt file: {prompt_file}")
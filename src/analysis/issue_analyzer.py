@@ -5,9 +5,60 @@ import logging
 import re
 from typing import Dict, Any, List, Optional, Set
 
+# Prefer the linear-time RE2 engine when google-re2 is installed; it never
+# backtracks, so long issue bodies cannot trigger pathological scans.
+# Patterns below use inline flags so they compile under either engine.
+try:
+    import re2 as _regex
+except ImportError:
+    _regex = re
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Pattern used to find file paths in issue text, as one alternation so the
+# text is scanned once. Each named group captures one way of mentioning a file.
+# This is a simple regex that might need tuning based on actual issues
+_FILE_PATH_RE = _regex.compile(
+    r'(?:^|\s)(?P<plain>\S+\.[a-zA-Z0-9]{1,10})(?:\s|$|:|,)'  # Simple file with extension
+    r'|in\s+`(?P<in_code>[^`]+\.[a-zA-Z0-9]{1,10})`'  # Files mentioned like: in `file.py`
+    r'|at\s+`(?P<at_code>[^`]+\.[a-zA-Z0-9]{1,10})`'  # Files mentioned like: at `file.py`
+    r'|(?:file|path):\s*[\'"]?(?P<labelled>[^\'"\s]+\.[a-zA-Z0-9]{1,10})[\'"]?'  # Files mentioned like: file: 'file.py'
+)
+
+# Common false positives for file paths: URLs, version numbers and domains
+_FALSE_PATH_RE = _regex.compile(r'(?s)^(?:http|.*\.(?:0|com)$)')
+
+# Patterns used to find error messages in issue text
+_ERROR_RES = [
+    _regex.compile(r'(?s)Error:\s*(.+?)(?:\n|$)'),  # Lines starting with "Error:"
+    _regex.compile(r'(?s)Exception:\s*(.+?)(?:\n|$)'),  # Lines with "Exception:"
+    _regex.compile(r'(?s)Traceback[^`]+```(?:python)?(.*?)```'),  # Code blocks with traceback
+    _regex.compile(r'(?s)```\s*(?:console|shell|bash)?\s*(.*?Error:.*?)```'),  # Code blocks with errors
+    _regex.compile(r'(?s)```\s*(?:console|shell|bash)?\s*(.*?Exception:.*?)```'),  # Code blocks with exceptions
+]
+
+_CODE_BLOCK_RE = _regex.compile(r'(?s)```(?:\w+)?\s*(.*?)```')
+_TRACEBACK_RE = _regex.compile(r'Error:|Exception:|Traceback')
+_SPECIFICITY_RE = _regex.compile(r'(?i)(specific|exact|line|column|function|method)\s+(\d+|name)')
+_INCONSISTENT_RE = _regex.compile(r'(?i)(sometimes|intermittent|random|occasionally|rarely|not sure)')
+
+# Keywords that indicate the issue type
+_BUG_KEYWORDS = ["bug", "error", "exception", "crash", "fail", "broken", "doesn't work", "does not work"]
+_FEATURE_KEYWORDS = ["feature", "enhancement", "request", "add", "new", "improvement"]
+_QUESTION_KEYWORDS = ["question", "how to", "guidance", "help", "wondering", "?"]
+
+_KEYWORD_TYPES = {
+    **{keyword: "bug" for keyword in _BUG_KEYWORDS},
+    **{keyword: "feature" for keyword in _FEATURE_KEYWORDS},
+    **{keyword: "question" for keyword in _QUESTION_KEYWORDS},
+}
+
+# Matches every keyword case-insensitively in a single pass over the text
+_KEYWORD_RE = _regex.compile(
+    r'(?i)' + '|'.join(re.escape(keyword) for keyword in sorted(_KEYWORD_TYPES, key=len, reverse=True))
+)
+
 
 def extract_file_paths(text: str) -> List[str]:
     """
@@ -17,31 +68,22 @@ def extract_file_paths(text: str) -> List[str]:
         text: Issue text
     
     Returns:
-        List of file paths
+        List of file paths, in the order they first appear
     """
-    # Look for file paths in the text
-    # This is a simple regex that might need tuning based on actual issues
-    file_path_patterns = [
-        r'(?:^|\s)(\S+\.[a-zA-Z0-9]{1,10})(?:\s|$|:|,)',  # Simple file with extension
-        r'(?:^|\s)((?:\.{0,2}\/)?(?:\w+\/)*\w+\.\w+)(?:\s|$|:|,)',  # Paths like ./dir/file.ext or dir/file.ext
-        r'in\s+`([^`]+\.[a-zA-Z0-9]{1,10})`',  # Files mentioned like: in `file.py`
-        r'at\s+`([^`]+\.[a-zA-Z0-9]{1,10})`',  # Files mentioned like: at `file.py`
-        r'(?:file|path):\s*[\'"]?([^\'"]+\.[a-zA-Z0-9]{1,10})[\'"]?',  # Files mentioned like: file: 'file.py'
-    ]
-    
-    file_paths = set()
-    for pattern in file_path_patterns:
-        matches = re.finditer(pattern, text)
-        for match in matches:
-            file_path = match.group(1)
-            # Clean up the file path
-            file_path = file_path.strip()
-            # Filter out common false positives
-            if not (file_path.startswith("http") or 
-                    file_path in ("v1.0", "v2.0") or 
-                    file_path.endswith(".0") or
-                    file_path.endswith(".com")):
-                file_paths.add(file_path)
+    # Look for file paths in the text, deduplicated in document order
+    file_paths = {}
+    for match in _FILE_PATH_RE.finditer(text):
+        file_path = (
+            match.group("plain")
+            or match.group("in_code")
+            or match.group("at_code")
+            or match.group("labelled")
+        )
+        # Clean up the file path
+        file_path = file_path.strip()
+        # Filter out common false positives
+        if not _FALSE_PATH_RE.match(file_path):
+            file_paths[file_path] = None
     
     return list(file_paths)
 
@@ -57,18 +99,9 @@ def extract_error_messages(text: str) -> List[str]:
         List of error messages
     """
     # Look for error patterns
-    error_patterns = [
-        r'Error:\s*(.+?)(?:\n|$)',  # Lines starting with "Error:"
-        r'Exception:\s*(.+?)(?:\n|$)',  # Lines with "Exception:"
-        r'Traceback[^`]+```(?:python)?(.*?)```',  # Code blocks with traceback
-        r'```\s*(?:console|shell|bash)?\s*(.*?Error:.*?)```',  # Code blocks with errors
-        r'```\s*(?:console|shell|bash)?\s*(.*?Exception:.*?)```',  # Code blocks with exceptions
-    ]
-    
     error_messages = []
-    for pattern in error_patterns:
-        matches = re.finditer(pattern, text, re.DOTALL)
-        for match in matches:
+    for pattern in _ERROR_RES:
+        for match in pattern.finditer(text):
             error_message = match.group(1).strip()
             if error_message:
                 error_messages.append(error_message)
@@ -88,7 +121,7 @@ def extract_code_blocks(text: str) -> List[str]:
     """
     # Look for code blocks
     code_blocks = []
-    for block in re.finditer(r'```(?:\w+)?\s*(.*?)```', text, re.DOTALL):
+    for block in _CODE_BLOCK_RE.finditer(text):
         code = block.group(1).strip()
         if code:
             code_blocks.append(code)
@@ -106,19 +139,22 @@ def determine_issue_type(text: str) -> str:
     Returns:
         Issue type
     """
-    # Look for keywords that indicate the issue type
-    bug_keywords = ["bug", "error", "exception", "crash", "fail", "broken", "doesn't work", "does not work"]
-    feature_keywords = ["feature", "enhancement", "request", "add", "new", "improvement"]
-    question_keywords = ["question", "how to", "guidance", "help", "wondering", "?"]
-    
-    text_lower = text.lower()
-    
-    bug_count = sum(1 for keyword in bug_keywords if keyword in text_lower)
-    feature_count = sum(1 for keyword in feature_keywords if keyword in text_lower)
-    question_count = sum(1 for keyword in question_keywords if keyword in text_lower)
+    # Count the distinct keywords of each type present in the text; (?i) also
+    # matches Unicode case variants (e.g. "craſh"), so normalise them with
+    # casefold() and skip the ones that don't fold back to a keyword
+    found = {match.group(0).casefold() for match in _KEYWORD_RE.finditer(text)}
+    counts = {"bug": 0, "feature": 0, "question": 0}
+    for keyword in found:
+        issue_type = _KEYWORD_TYPES.get(keyword)
+        if issue_type:
+            counts[issue_type] += 1
+    
+    bug_count = counts["bug"]
+    feature_count = counts["feature"]
+    question_count = counts["question"]
     
     # Check for error messages and stack traces
-    if re.search(r'Error:|Exception:|Traceback', text):
+    if _TRACEBACK_RE.search(text):
         bug_count += 2
     
     # Make a decision based on counts
@@ -133,13 +169,22 @@ def determine_issue_type(text: str) -> str:
         return "bug"
 
 
-def evaluate_fix_potential(text: str, issue_type: str) -> float:
+def evaluate_fix_potential(
+    text: str,
+    issue_type: str,
+    file_paths: List[str],
+    error_messages: List[str],
+    code_blocks: List[str],
+) -> float:
     """
     Evaluate the potential for an automated fix.
     
     Args:
         text: Issue text
         issue_type: Issue type
+        file_paths: File paths extracted from the issue
+        error_messages: Error messages extracted from the issue
+        code_blocks: Code blocks extracted from the issue
     
     Returns:
         Score between 0.0 and 1.0
@@ -151,21 +196,21 @@ def evaluate_fix_potential(text: str, issue_type: str) -> float:
     score = 0.5  # Start with a middle score
     
     # Add points for positive indicators
-    if extract_file_paths(text):
+    if file_paths:
         score += 0.2  # We have file paths
     
-    if extract_error_messages(text):
+    if error_messages:
         score += 0.2  # We have error messages
     
-    if extract_code_blocks(text):
+    if code_blocks:
         score += 0.1  # We have code blocks
     
     # Look for specificity
-    if re.search(r'(specific|exact|line|column|function|method)\s+(\d+|name)', text, re.IGNORECASE):
+    if _SPECIFICITY_RE.search(text):
         score += 0.1  # Issue seems specific
     
     # Look for negative indicators
-    if re.search(r'(sometimes|intermittent|random|occasionally|rarely|not sure)', text, re.IGNORECASE):
+    if _INCONSISTENT_RE.search(text):
         score -= 0.2  # Issue seems inconsistent
     
     if len(text.split()) < 20:
@@ -195,7 +240,9 @@ def analyze_issue(text: str) -> Dict[str, Any]:
     error_messages = extract_error_messages(text)
     code_blocks = extract_code_blocks(text)
     issue_type = determine_issue_type(text)
-    fix_potential = evaluate_fix_potential(text, issue_type)
+    fix_potential = evaluate_fix_potential(
+        text, issue_type, file_paths, error_messages, code_blocks
+    )
     
     # Determine if the issue is fixable
     is_fixable = fix_potential >= 0.6
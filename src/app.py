@@ -1,29 +1,44 @@
 """
 Main application module for the GitHub Aider Bot.
 """
+import atexit
+import hashlib
 import hmac
-import json
 import logging
+import queue
 import sys
+from logging.handlers import QueueHandler, QueueListener
+from contextlib import asynccontextmanager
 from typing import Dict, Any, Optional
 
+import msgspec
 import uvicorn
-from fastapi import FastAPI, Request, Response, HTTPException, Depends, BackgroundTasks
+from fastapi import FastAPI, Request, Response, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
 from src.config import config
-from src.github.app import get_installation_client
-from src.github.issues import process_issue_event
+from src.github.app import close_http_session, get_installation_client
+from src.github.events import WebhookEvent, decode_event
+from src.github.issues import issue_worker, process_issue_event
 from src.github.pr import create_pull_request
 
-# Configure logging at the start of the file
+# Configure logging at the start of the file. Records are formatted by the
+# queue handler and written by a background thread, so logging never blocks
+# the event loop on disk or stdout writes.
+_log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+_log_listener = QueueListener(
+    _log_queue,
+    logging.StreamHandler(sys.stdout),
+    logging.FileHandler('aider-bot.log'),
+)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler('aider-bot.log')
-    ]
+    handlers=[QueueHandler(_log_queue)]
 )
 
 logger = logging.getLogger(__name__)
@@ -35,8 +50,24 @@ logger.info(f"GitHub App ID: {config.github.app_id}")
 logger.info(f"Webhook secret configured: {bool(config.github.webhook_secret)}")
 logger.info(f"Private key file exists: {bool(config.github.private_key)}")
 
+# Encode the webhook secret once instead of on every delivery
+_WEBHOOK_SECRET_BYTES = config.github.webhook_secret.encode()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Release shared resources when the server shuts down."""
+    yield
+    await issue_worker.stop()
+    await close_http_session()
+
+
 # Create FastAPI application
-app = FastAPI(title="GitHub Aider Bot")
+app = FastAPI(
+    title="GitHub Aider Bot",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
+)
 
 # Add CORS middleware
 app.add_middleware(
@@ -48,7 +79,24 @@ app.add_middleware(
 )
 
 
-async def verify_webhook(request: Request) -> Optional[Dict[str, Any]]:
+def parse_webhook_body(body: bytes) -> WebhookEvent:
+    """
+    Decode a webhook body into a WebhookEvent.
+    
+    Raises:
+        HTTPException: If the body is not a valid webhook payload
+    """
+    try:
+        return decode_event(body)
+    except msgspec.DecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid payload: {e}")
+
+
+# Webhook events the bot acts on; other deliveries are ignored unread
+_HANDLED_EVENTS = {"issues", "issue_comment"}
+
+
+async def verify_webhook(request: Request) -> Optional[WebhookEvent]:
     """
     Verify that the webhook came from GitHub.
     
@@ -56,15 +104,20 @@ async def verify_webhook(request: Request) -> Optional[Dict[str, Any]]:
         request: The incoming request
         
     Returns:
-        The parsed webhook payload if valid
+        The decoded webhook event if valid, or None for event types the bot
+        does not handle, without reading the body
         
     Raises:
         HTTPException: If the webhook signature is invalid
     """
+    github_event = request.headers.get("X-GitHub-Event")
+    if github_event and github_event not in _HANDLED_EVENTS:
+        return None
+    
     if not config.github.webhook_secret or config.github.webhook_secret == "":
         logger.warning("Webhook secret not configured, skipping verification")
         body = await request.body()
-        return json.loads(body)
+        return parse_webhook_body(body)
     
     signature = request.headers.get("X-Hub-Signature-256")
     if not signature:
@@ -73,53 +126,69 @@ async def verify_webhook(request: Request) -> Optional[Dict[str, Any]]:
     body = await request.body()
     
     # Verify signature
-    sha_name, signature = signature.split("=")
+    sha_name, _, signature = signature.partition("=")
     if sha_name != "sha256":
         raise HTTPException(status_code=401, detail="Invalid signature hash algorithm")
     
-    mac = hmac.new(
-        config.github.webhook_secret.encode(), 
-        msg=body, 
-        digestmod="sha256"
-    )
-    if not hmac.compare_digest(mac.hexdigest(), signature):
+    try:
+        expected = bytes.fromhex(signature)
+    except ValueError:
+        raise HTTPException(status_code=401, detail="Invalid signature")
+    
+    # One-shot HMAC, computed by OpenSSL without a Python-level HMAC object
+    digest = hmac.digest(_WEBHOOK_SECRET_BYTES, body, hashlib.sha256)
+    if not hmac.compare_digest(digest, expected):
         raise HTTPException(status_code=401, detail="Invalid signature")
     
-    return json.loads(body)
+    return parse_webhook_body(body)
 
 
 @app.post("/webhook")
 async def webhook(
     request: Request,
-    background_tasks: BackgroundTasks,
-    payload: Dict[str, Any] = Depends(verify_webhook),
+    response: Response,
+    payload: Optional[WebhookEvent] = Depends(verify_webhook),
 ):
     """Handle GitHub webhook events."""
+    if payload is None:
+        return {"status": "ignored", "reason": "Unhandled event type"}
+    
     logger.info("Received webhook event")
-    logger.info(f"Headers: {dict(request.headers)}")
+    # Dumping headers and the payload is costly, only do it when debugging
+    debug = logger.isEnabledFor(logging.DEBUG)
+    if debug:
+        logger.debug("Headers: %s", dict(request.headers))
+    delivery_id = request.headers.get("X-GitHub-Delivery")
     logger.info(f"GitHub Event: {request.headers.get('X-GitHub-Event')}")
-    logger.info(f"GitHub Delivery: {request.headers.get('X-GitHub-Delivery')}")
+    logger.info(f"GitHub Delivery: {delivery_id}")
     
-    event_type = payload.get("action")
+    event_type = payload.action
     logger.info(f"Event type: {event_type}")
-    logger.info(f"Payload: {json.dumps(payload, indent=2)}")
+    if debug:
+        # Log the raw body, it has the fields the decoded event leaves out
+        logger.debug("Payload: %s", msgspec.json.format(await request.body(), indent=2).decode())
     
     if not event_type:
         return {"status": "ignored", "reason": "No action specified"}
     
     # Check if it's an issue event
-    if "issue" in payload:
+    if payload.issue is not None:
+        if payload.repository is None:
+            raise HTTPException(
+                status_code=400, detail="Invalid payload: issue event without a repository"
+            )
+        
         # Only process newly opened issues or issues with specific labels
         if event_type in ["opened", "labeled"]:
-            # Process the issue in the background
-            background_tasks.add_task(
-                process_issue_event, 
-                payload
-            )
+            # Queue the issue for the background worker and acknowledge the
+            # delivery right away so GitHub does not time out and retry
+            if not await process_issue_event(payload, delivery_id):
+                return {"status": "ignored", "reason": "Duplicate delivery"}
+            response.status_code = 202
             return {
                 "status": "processing",
                 "event_type": event_type,
-                "issue_number": payload["issue"]["number"],
+                "issue_number": payload.issue.number,
             }
     
     return {"status": "ignored", "event_type": event_type}
@@ -144,11 +213,15 @@ async def root():
 def main():
     """Run the server."""
     import uvicorn
+    
+    from src.server import uvicorn_runtime
+    
     uvicorn.run(
         "src.app:app",
         host=config.server.host,
         port=config.server.port,
         reload=False,  # Force disable reload to prevent double starts
+        **uvicorn_runtime(),
     )
 
 
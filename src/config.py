@@ -2,11 +2,12 @@
 Configuration module for the GitHub Aider Bot.
 """
 import os
+from functools import cached_property
 from pathlib import Path
 from typing import Optional, Dict, List, Any
 
+import msgspec
 from dotenv import load_dotenv
-from pydantic import BaseModel, Field
 import logging
 
 # Load environment variables from .env file
@@ -15,23 +16,32 @@ load_dotenv()
 logger = logging.getLogger(__name__)
 
 
-class ServerConfig(BaseModel):
+def safe_load_yaml(content: str) -> Any:
+    """Parse YAML safely, with libyaml's C loader when PyYAML was built with it."""
+    import yaml
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    return yaml.load(content, Loader=loader)
+
+
+class ServerConfig(msgspec.Struct):
     """Server configuration."""
-    host: str = Field(default=os.getenv("HOST", "0.0.0.0"))
-    port: int = Field(default=int(os.getenv("PORT", "8000")))
-    debug: bool = Field(default=os.getenv("DEBUG", "False").lower() == "true")
+    host: str = os.getenv("HOST", "0.0.0.0")
+    port: int = int(os.getenv("PORT", "8000"))
+    debug: bool = os.getenv("DEBUG", "False").lower() == "true"
+    cache_dir: str = os.getenv("CACHE_DIR") or os.path.expanduser("~/.cache/github-aider-bot")
+    issue_workers: int = int(os.getenv("ISSUE_WORKERS") or os.cpu_count() or 1)
 
 
-class GitHubConfig(BaseModel):
+class GitHubConfig(msgspec.Struct, dict=True):
     """GitHub App configuration."""
-    app_id: int = Field(default=int(os.getenv("GITHUB_APP_ID", "0") or "0"))
-    private_key_path: str = Field(default=os.getenv("GITHUB_PRIVATE_KEY_PATH", ""))
-    webhook_secret: str = Field(default=os.getenv("GITHUB_WEBHOOK_SECRET", ""))
-    app_name: str = Field(default=os.getenv("GITHUB_APP_NAME", "aider-bot"))
+    app_id: int = int(os.getenv("GITHUB_APP_ID", "0") or "0")
+    private_key_path: str = os.getenv("GITHUB_PRIVATE_KEY_PATH", "")
+    webhook_secret: str = os.getenv("GITHUB_WEBHOOK_SECRET", "")
+    app_name: str = os.getenv("GITHUB_APP_NAME", "aider-bot")
 
-    @property
+    @cached_property
     def private_key(self) -> str:
-        """Read the private key from the file."""
+        """Read the private key from the file, once."""
         if not self.private_key_path:
             logger.error("No private key path configured")
             return ""
@@ -45,33 +55,48 @@ class GitHubConfig(BaseModel):
             logger.error(f"Failed to read private key: {e}")
             return ""
 
+    @cached_property
+    def signing_key(self) -> Optional[Any]:
+        """Parse the private key once, for signing JWTs without re-reading the PEM."""
+        if not self.private_key:
+            return None
+        
+        from cryptography.hazmat.primitives import serialization
+        try:
+            return serialization.load_pem_private_key(
+                self.private_key.encode(), password=None
+            )
+        except Exception as e:
+            logger.error(f"Failed to parse private key: {e}")
+            return None
+
 
-class AiderConfig(BaseModel):
+class AiderConfig(msgspec.Struct):
     """Configuration for Aider integration."""
-    binary_path: str = Field(default=os.getenv("AIDER_BINARY_PATH", "aider"))
-    model: str = Field(default=os.getenv("AIDER_MODEL", "gpt-4-turbo-preview"))
-    api_key: Optional[str] = Field(default=os.getenv("OPENAI_API_KEY") or os.getenv("AIDER_API_KEY"))
+    binary_path: str = os.getenv("AIDER_BINARY_PATH", "aider")
+    model: str = os.getenv("AIDER_MODEL", "gpt-4-turbo-preview")
+    api_key: Optional[str] = os.getenv("OPENAI_API_KEY") or os.getenv("AIDER_API_KEY")
+    max_concurrent: int = int(os.getenv("AIDER_MAX_CONCURRENCY", "2"))
 
 
-class RepoConfig(BaseModel):
+class RepoConfig(msgspec.Struct):
     """Repository-specific configuration."""
-    labels: Dict[str, List[str]] = Field(
-        default={"process": ["bug", "fix-me"], "ignore": ["discussion", "wontfix"]}
+    labels: Dict[str, List[str]] = msgspec.field(
+        default_factory=lambda: {"process": ["bug", "fix-me"], "ignore": ["discussion", "wontfix"]}
     )
-    files: Dict[str, List[str]] = Field(
-        default={"include": ["**"], "exclude": []}
+    files: Dict[str, List[str]] = msgspec.field(
+        default_factory=lambda: {"include": ["**"], "exclude": []}
     )
-    pr: Dict[str, Any] = Field(
-        default={"draft": False, "reviewers": []}
+    pr: Dict[str, Any] = msgspec.field(
+        default_factory=lambda: {"draft": False, "reviewers": []}
     )
 
     @classmethod
     def from_yaml(cls, yaml_content: str) -> "RepoConfig":
         """Create config from YAML content."""
-        import yaml
         try:
-            config_dict = yaml.safe_load(yaml_content) or {}
-            return cls(**config_dict)
+            config_dict = safe_load_yaml(yaml_content) or {}
+            return msgspec.convert(config_dict, cls)
         except Exception as e:
             print(f"Error parsing repo config: {e}")
             return cls()
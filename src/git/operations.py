@@ -1,12 +1,14 @@
 """
 Git operations module.
 """
+import asyncio
+import base64
 import logging
 import os
 import re
-import shutil
-import tempfile
-from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+from urllib.parse import unquote, urlparse, urlsplit, urlunsplit
 
 import git
 from git import Repo
@@ -14,41 +16,181 @@ from git import Repo
 # Configure logging
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
 
-def checkout_branch(repo_url: str, branch_name: str) -> Optional[str]:
+# GitPython shells out to git synchronously, so blocking git work is run on
+# this pool to keep the event loop free
+_git_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="git")
+
+
+async def run_in_git_pool(func: Callable[..., T], *args: Any) -> T:
+    """
+    Run a blocking git function on the git thread pool.
+    
+    Args:
+        func: Function to run
+        *args: Arguments for the function
+    
+    Returns:
+        The function's return value
     """
-    Clone a repository and checkout a new branch.
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_git_pool, func, *args)
+
+
+def split_credentials(repo_url: str) -> Tuple[str, Dict[str, str]]:
+    """
+    Separate the credentials from a repository URL.
+    
+    The credentials are turned into an ``http.extraHeader`` setting passed
+    through ``GIT_CONFIG_*`` environment variables, so they are never
+    written to a repository's config or shown on a git command line.
+    
+    Args:
+        repo_url: Repository URL, possibly with ``user:password@`` in it
+    
+    Returns:
+        Tuple of (URL without credentials, environment variables for git)
+    """
+    parts = urlsplit(repo_url)
+    if not parts.username:
+        return repo_url, {}
+    
+    netloc = parts.hostname or ""
+    if parts.port:
+        netloc += f":{parts.port}"
+    credentials = f"{unquote(parts.username)}:{unquote(parts.password or '')}"
+    header = "Authorization: Basic " + base64.b64encode(credentials.encode()).decode()
+    
+    env = {
+        "GIT_CONFIG_COUNT": "1",
+        "GIT_CONFIG_KEY_0": "http.extraHeader",
+        "GIT_CONFIG_VALUE_0": header,
+    }
+    return urlunsplit(parts._replace(netloc=netloc)), env
+
+
+def _repo_owner_and_name(repo_url: str) -> Tuple[str, str]:
+    """Get the owner and name of a repository from its clone URL."""
+    path = urlparse(repo_url).path.rstrip("/")
+    if path.endswith(".git"):
+        path = path[:-len(".git")]
+    owner, _, repo = path.rpartition("/")
+    return os.path.basename(owner) or "_", repo
+
+
+def checkout_branch(
+    repo_url: str,
+    branch_name: str,
+    base_branch: Optional[str] = None,
+) -> Optional[str]:
+    """
+    Check out a new branch of a repository into a temporary working tree.
+    
+    The repository is cloned once into the repository cache (``CACHE_DIR``);
+    later calls only fetch new commits and add a worktree, instead of cloning
+    again. Remove the working tree with ``workspace_manager.remove_worktree``
+    when done; deleting the directory also works, the cache prunes it later.
     
     Args:
         repo_url: Repository URL
         branch_name: Branch name to create
+        base_branch: Branch to start from, defaults to the remote's default branch
     
     Returns:
-        Path to the cloned repository if successful, None otherwise
+        Path to the working tree if successful, None otherwise
     """
-    # Create a temporary directory for the repo
-    repo_dir = tempfile.mkdtemp(prefix="aider-bot-")
+    # Imported here, the workspace module itself imports this one
+    from src.git.workspace import workspace_manager
+    
+    owner, repo = _repo_owner_and_name(repo_url)
     
     try:
-        logger.info(f"Cloning repository {repo_url} to {repo_dir}")
-        
-        # Clone the repo
-        repo = Repo.clone_from(repo_url, repo_dir)
+        logger.info(f"Checking out {owner}/{repo} from the repository cache")
         
         # Create and checkout a new branch
         logger.info(f"Creating branch {branch_name}")
-        repo.git.checkout('-b', branch_name)
-        
-        return repo_dir
+        return workspace_manager.add_worktree(
+            owner, repo, repo_url, base_branch, new_branch=branch_name
+        )
     
     except Exception as e:
         logger.exception(f"Error checking out branch: {e}")
-        # Clean up if we failed
-        if os.path.exists(repo_dir):
-            shutil.rmtree(repo_dir, ignore_errors=True)
         return None
 
 
+# Matches a unified diff hunk header: @@ -start[,count] +start[,count] @@
+_HUNK_HEADER_RE = re.compile(rb'@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+
+
+def _parse_hunks(diff_content: bytes) -> List[Tuple[int, List[bytes], List[bytes]]]:
+    """
+    Parse the hunks of a unified diff in a single pass.
+    
+    Args:
+        diff_content: Diff content, as bytes
+    
+    Returns:
+        List of (start, old_lines, new_lines) per hunk, where start is the
+        0-based index of the first original line the hunk replaces
+    """
+    hunks = []
+    diff_lines = diff_content.splitlines(keepends=True)
+    i = 0
+    
+    while i < len(diff_lines):
+        line = diff_lines[i]
+        # Only lines starting with "@@" can be hunk headers
+        header = _HUNK_HEADER_RE.match(line) if line.startswith(b"@@") else None
+        i += 1
+        if not header:
+            # File headers and any text around the hunks
+            continue
+        
+        old_start, old_count, _, new_count = (
+            int(value) if value is not None else 1 for value in header.groups()
+        )
+        old_lines: List[bytes] = []
+        new_lines: List[bytes] = []
+        last_targets: List[List[bytes]] = []
+        
+        # Read exactly as many lines as the header announces
+        while i < len(diff_lines) and (
+            len(old_lines) < old_count or len(new_lines) < new_count
+            or diff_lines[i].startswith(b"\\")
+        ):
+            line = diff_lines[i]
+            i += 1
+            
+            if line.startswith(b"\\"):
+                # "\ No newline at end of file" applies to the previous line
+                for target in last_targets:
+                    target[-1] = target[-1].rstrip(b"\r\n")
+                continue
+            
+            if line.startswith(b"+"):
+                last_targets = [new_lines]
+            elif line.startswith(b"-"):
+                last_targets = [old_lines]
+            else:
+                # Context line; blank ones may have lost their leading space
+                last_targets = [old_lines, new_lines]
+            
+            text = line[1:] if line[:1] in (b"+", b"-", b" ") else line
+            if not text.endswith(b"\n"):
+                # The diff's last line may be unterminated; unless a "\ No
+                # newline" marker follows, it must not be joined to the next
+                text += b"\n"
+            for target in last_targets:
+                target.append(text)
+        
+        # A hunk that removes nothing inserts after its start line
+        start = old_start if old_count == 0 else old_start - 1
+        hunks.append((start, old_lines, new_lines))
+    
+    return hunks
+
+
 def apply_diff(file_path: str, diff_content: str) -> bool:
     """
     Apply a diff to a file.
@@ -61,44 +203,34 @@ def apply_diff(file_path: str, diff_content: str) -> bool:
         True if successful, False otherwise
     """
     try:
-        # Parse the diff to extract line changes
-        lines = []
-        current_line = 0
-        
-        # Read the current file
-        with open(file_path, 'r') as f:
+        # Work on raw bytes, so files are patched without decoding them
+        with open(file_path, 'rb') as f:
             lines = f.readlines()
         
-        # Extract the diff hunks
-        for hunk in re.finditer(r'@@ -(\d+)(?:,\d+)? \+(\d+)(?:,\d+)? @@(.*?)(?=\n@@ |\Z)', 
-                               diff_content, re.DOTALL):
-            start_line = int(hunk.group(2)) - 1  # 0-based index
-            hunk_content = hunk.group(3)
-            
-            # Process lines in the hunk
-            lines_to_add = []
-            skip_lines = 0
-            
-            for line in hunk_content.split('\n')[1:]:  # Skip the hunk header line
-                if not line:
-                    continue
-                
-                if line.startswith('+'):
-                    # Add this line
-                    lines_to_add.append(line[1:])
-                elif line.startswith('-'):
-                    # Skip this line in the original file
-                    skip_lines += 1
-                else:
-                    # Context line, keep both
-                    lines_to_add.append(line)
+        hunks = _parse_hunks(diff_content.encode())
+        if not hunks:
+            logger.warning(f"No hunks found in diff for {file_path}")
+            return False
+        
+        # Copy the file through, replacing the lines each hunk covers
+        new_lines = []
+        position = 0
+        for start, old_lines, hunk_lines in hunks:
+            end = start + len(old_lines)
+            original = [line.rstrip(b"\r\n") for line in lines[start:end]]
+            if start < position or original != [line.rstrip(b"\r\n") for line in old_lines]:
+                logger.error(f"Diff does not match {file_path} at line {start + 1}")
+                return False
             
-            # Apply the changes to the file
-            lines[start_line:start_line + skip_lines] = lines_to_add
+            new_lines.extend(lines[position:start])
+            new_lines.extend(hunk_lines)
+            position = end
+        
+        new_lines.extend(lines[position:])
         
-        # Write the modified file
-        with open(file_path, 'w') as f:
-            f.writelines(lines)
+        # Write the modified file in one go
+        with open(file_path, 'wb') as f:
+            f.write(b"".join(new_lines))
         
         return True
     
@@ -107,11 +239,40 @@ def apply_diff(file_path: str, diff_content: str) -> bool:
         return False
 
 
+def _commit_locally(
+    repo_path: str,
+    commit_message: str,
+    changes: Dict[str, str],
+) -> Repo:
+    """Apply diffs to a repository and commit them, without pushing."""
+    # Open the repository
+    repo = Repo(repo_path)
+    
+    # Apply changes to files
+    for file_path, diff_content in changes.items():
+        full_path = os.path.join(repo_path, file_path)
+        if not os.path.exists(full_path):
+            logger.warning(f"File {file_path} does not exist, skipping")
+            continue
+        
+        # Apply the diff to the file
+        apply_diff(full_path, diff_content)
+    
+    # Add all changes
+    repo.git.add('.')
+    
+    # Create the commit
+    repo.git.commit('-m', commit_message)
+    
+    return repo
+
+
 def commit_changes(
     repo_path: str,
     branch_name: str,
     commit_message: str,
     changes: Dict[str, str],
+    repo_url: Optional[str] = None,
 ) -> bool:
     """
     Commit changes to a repository.
@@ -121,6 +282,8 @@ def commit_changes(
         branch_name: Branch name
         commit_message: Commit message
         changes: Dictionary of file paths to diff content
+        repo_url: Repository URL with the credentials to push with; the
+            cached repository's origin URL has none
     
     Returns:
         True if successful, False otherwise
@@ -128,27 +291,79 @@ def commit_changes(
     try:
         logger.info(f"Committing changes to branch {branch_name}")
         
-        # Open the repository
-        repo = Repo(repo_path)
+        repo = _commit_locally(repo_path, commit_message, changes)
         
-        # Apply changes to files
-        for file_path, diff_content in changes.items():
-            full_path = os.path.join(repo_path, file_path)
-            if not os.path.exists(full_path):
-                logger.warning(f"File {file_path} does not exist, skipping")
-                continue
-            
-            # Apply the diff to the file
-            apply_diff(full_path, diff_content)
+        # Push the changes
+        _, env = split_credentials(repo_url or "")
+        repo.git.push('--set-upstream', 'origin', branch_name, env=env)
         
-        # Add all changes
-        repo.git.add('.')
+        logger.info(f"Changes committed and pushed to {branch_name}")
+        return True
+    
+    except Exception as e:
+        logger.exception(f"Error committing changes: {e}")
+        return False
+
+
+async def checkout_branch_async(
+    repo_url: str,
+    branch_name: str,
+    base_branch: Optional[str] = None,
+) -> Optional[str]:
+    """
+    Clone a repository and checkout a new branch, without blocking the event loop.
+    
+    Args:
+        repo_url: Repository URL
+        branch_name: Branch name to create
+        base_branch: Branch to start from, defaults to the remote's default branch
+    
+    Returns:
+        Path to the cloned repository if successful, None otherwise
+    """
+    return await run_in_git_pool(checkout_branch, repo_url, branch_name, base_branch)
+
+
+async def commit_changes_async(
+    repo_path: str,
+    branch_name: str,
+    commit_message: str,
+    changes: Dict[str, str],
+    repo_url: Optional[str] = None,
+) -> bool:
+    """
+    Commit changes to a repository, without blocking the event loop.
+    
+    The commit is made on the git thread pool and pushed by a git subprocess.
+    
+    Args:
+        repo_path: Path to the repository
+        branch_name: Branch name
+        commit_message: Commit message
+        changes: Dictionary of file paths to diff content
+        repo_url: Repository URL with the credentials to push with
+    
+    Returns:
+        True if successful, False otherwise
+    """
+    try:
+        logger.info(f"Committing changes to branch {branch_name}")
         
-        # Create the commit
-        repo.git.commit('-m', commit_message)
+        await run_in_git_pool(_commit_locally, repo_path, commit_message, changes)
         
         # Push the changes
-        repo.git.push('--set-upstream', 'origin', branch_name)
+        _, env = split_credentials(repo_url or "")
+        process = await asyncio.create_subprocess_exec(
+            "git", "push", "--set-upstream", "origin", branch_name,
+            cwd=repo_path,
+            env={**os.environ, **env},
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        _, stderr = await process.communicate()
+        if process.returncode != 0:
+            logger.error(f"Error pushing to {branch_name}: {stderr.decode(errors='replace')}")
+            return False
         
         logger.info(f"Changes committed and pushed to {branch_name}")
         return True
@@ -0,0 +1,242 @@
+"""
+Git workspace management module.
+"""
+import logging
+import os
+import shutil
+import tempfile
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Iterator, Optional
+
+from git import Repo
+from git.exc import GitCommandError
+
+from src.config import config
+from src.git.operations import run_in_git_pool, split_credentials
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Cached clones are locked with flock, or with msvcrt on Windows, where
+# fcntl is not available
+try:
+    import fcntl
+except ImportError:
+    import msvcrt
+
+    def _lock_file(lock_file) -> None:
+        """Take an exclusive lock on an open file, waiting until it is free."""
+        lock_file.seek(0)
+        while True:
+            try:
+                # LK_LOCK gives up after 10 seconds, so keep waiting like flock
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue
+
+    def _unlock_file(lock_file) -> None:
+        """Release the lock taken by _lock_file."""
+        lock_file.seek(0)
+        msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    def _lock_file(lock_file) -> None:
+        """Take an exclusive lock on an open file, waiting until it is free."""
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+    def _unlock_file(lock_file) -> None:
+        """Release the lock taken by _lock_file."""
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+# Only the tip commit is fetched, and file contents are downloaded lazily
+# when a worktree checks them out, so history and unused blobs never hit disk
+_FETCH_OPTIONS = ("--depth=1", "--filter=blob:none", "--no-tags")
+
+
+class WorkspaceManager:
+    """
+    Hand out disposable working trees backed by one cached clone per repository.
+
+    Each repository is fetched once into a bare clone under the cache
+    directory. Later jobs only fetch new objects into that clone and check
+    the branch out with `git worktree add`, instead of cloning again. Fetches
+    are shallow and partial, so only the files a worktree needs are downloaded.
+    Changes to a cached clone hold a per-repository file lock, so concurrent
+    jobs for the same repository take turns.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+
+    def mirror_path(self, owner: str, repo: str) -> str:
+        """Get the path of the cached bare clone for a repository."""
+        return os.path.join(self.cache_dir, owner, f"{repo}.git")
+
+    @contextmanager
+    def _locked(self, owner: str, repo: str) -> Iterator[None]:
+        """Hold the lock of a repository's cached clone for the duration of a block."""
+        lock_path = os.path.join(self.cache_dir, owner, f"{repo}.lock")
+        os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+        with open(lock_path, "a") as lock_file:
+            _lock_file(lock_file)
+            try:
+                yield
+            finally:
+                _unlock_file(lock_file)
+
+    def _open_mirror(self, owner: str, repo: str, clone_url: str) -> Repo:
+        """Open the cached bare clone, creating it if needed."""
+        path = self.mirror_path(owner, repo)
+
+        # Credentials are passed to each command, never stored in the config
+        origin_url, _ = split_credentials(clone_url)
+
+        if os.path.isdir(path):
+            mirror = Repo(path)
+            mirror.remote("origin").set_url(origin_url)
+            return mirror
+
+        logger.info(f"Creating repository cache for {owner}/{repo} at {path}")
+        mirror = Repo.init(path, bare=True)
+        mirror.create_remote("origin", origin_url)
+        return mirror
+
+    def update(self, owner: str, repo: str, clone_url: str, branch: Optional[str]) -> str:
+        """
+        Fetch the latest commit of a branch into the cache.
+
+        Args:
+            owner: Repository owner
+            repo: Repository name
+            clone_url: URL to fetch from
+            branch: Branch to fetch, or None for the remote's default branch
+
+        Returns:
+            The commit SHA the branch points to
+        """
+        with self._locked(owner, repo):
+            return self._fetch(owner, repo, clone_url, branch)
+
+    def _fetch(self, owner: str, repo: str, clone_url: str, branch: Optional[str]) -> str:
+        """Fetch a branch into the cache; the caller must hold the lock."""
+        mirror = self._open_mirror(owner, repo, clone_url)
+        _, env = split_credentials(clone_url)
+
+        if branch is None:
+            ref = "refs/remotes/origin/HEAD"
+            mirror.git.fetch(*_FETCH_OPTIONS, "origin", f"+HEAD:{ref}", env=env)
+        else:
+            ref = f"refs/remotes/origin/{branch}"
+            mirror.git.fetch(
+                *_FETCH_OPTIONS, "--prune", "origin", f"+refs/heads/{branch}:{ref}", env=env
+            )
+
+        return mirror.git.rev_parse(ref)
+
+    def add_worktree(
+        self,
+        owner: str,
+        repo: str,
+        clone_url: str,
+        branch: Optional[str],
+        new_branch: Optional[str] = None,
+    ) -> str:
+        """
+        Create a working tree with the latest commit of a branch checked out.
+
+        Args:
+            owner: Repository owner
+            repo: Repository name
+            clone_url: URL to fetch from
+            branch: Branch to check out, or None for the remote's default branch
+            new_branch: Create (or reset) this branch at that commit instead of
+                checking out a detached HEAD
+
+        Returns:
+            Path to the new working tree
+        """
+        path = tempfile.mkdtemp(prefix="aider-bot-")
+        try:
+            with self._locked(owner, repo):
+                sha = self._fetch(owner, repo, clone_url, branch)
+
+                mirror = Repo(self.mirror_path(owner, repo))
+                # Forget worktrees whose directories were deleted without remove_worktree
+                mirror.git.worktree("prune")
+
+                # Checking out downloads the blobs the partial fetch skipped
+                _, env = split_credentials(clone_url)
+                if new_branch:
+                    mirror.git.worktree("add", "-B", new_branch, path, sha, env=env)
+                else:
+                    mirror.git.worktree("add", "--detach", path, sha, env=env)
+        except Exception:
+            shutil.rmtree(path, ignore_errors=True)
+            raise
+
+        logger.info(f"Checked out {owner}/{repo}@{sha[:7]} ({branch}) to {path}")
+        return path
+
+    def remove_worktree(self, owner: str, repo: str, path: str) -> None:
+        """
+        Remove a working tree created by add_worktree.
+
+        Args:
+            owner: Repository owner
+            repo: Repository name
+            path: Path to the working tree
+        """
+        with self._locked(owner, repo):
+            mirror = Repo(self.mirror_path(owner, repo))
+            try:
+                mirror.git.worktree("remove", "--force", path)
+            except GitCommandError as e:
+                logger.warning(f"Failed to remove worktree {path}: {e}")
+                shutil.rmtree(path, ignore_errors=True)
+                mirror.git.worktree("prune")
+
+    @contextmanager
+    def worktree(self, owner: str, repo: str, clone_url: str, branch: str) -> Iterator[str]:
+        """
+        Check out a branch into a temporary working tree for the duration of a block.
+
+        Args:
+            owner: Repository owner
+            repo: Repository name
+            clone_url: URL to fetch from
+            branch: Branch to check out
+
+        Yields:
+            Path to the working tree
+        """
+        path = self.add_worktree(owner, repo, clone_url, branch)
+        try:
+            yield path
+        finally:
+            self.remove_worktree(owner, repo, path)
+
+    @asynccontextmanager
+    async def worktree_async(
+        self, owner: str, repo: str, clone_url: str, branch: str
+    ) -> AsyncIterator[str]:
+        """
+        Like worktree, but fetches and cleans up on the git thread pool.
+
+        Args:
+            owner: Repository owner
+            repo: Repository name
+            clone_url: URL to fetch from
+            branch: Branch to check out
+
+        Yields:
+            Path to the working tree
+        """
+        path = await run_in_git_pool(self.add_worktree, owner, repo, clone_url, branch)
+        try:
+            yield path
+        finally:
+            await run_in_git_pool(self.remove_worktree, owner, repo, path)
+
+
+# Create a singleton instance
+workspace_manager = WorkspaceManager(config.server.cache_dir)
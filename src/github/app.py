@@ -1,49 +1,188 @@
 """
 GitHub App integration module.
 """
+import asyncio
+import functools
 import jwt
 import time
 import logging
-from typing import Optional, Dict, Any, Tuple
+import random
+import threading
+from collections import OrderedDict
+from http import HTTPStatus
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
 
-import requests
-from github import GithubIntegration, Github
+from github import GithubException, GithubIntegration, Github
+from github.Repository import Repository
 import aiohttp
+from gidgethub import BadRequest
 from gidgethub.aiohttp import GitHubAPI
 
-from src.config import config
+from src.config import config, safe_load_yaml
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+
+async def run_github_call(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run a blocking PyGithub call in a thread, so it does not block the event loop.
+    
+    Args:
+        func: PyGithub method or function to call
+        *args: Positional arguments for the call
+        **kwargs: Keyword arguments for the call
+    
+    Returns:
+        The call's return value
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+
+# Writes rejected by a rate limit are retried after the wait GitHub asks for,
+# without using up attempts. Server errors are retried with exponential
+# backoff, but only for idempotent calls: a POST that failed with a 5xx may
+# still have been applied, and repeating it would post a second comment or
+# fail because the ref or pull request already exists. No write keeps
+# retrying for longer than the deadline.
+_RATE_LIMIT_STATUSES = {403, 429}
+_RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+_MAX_WRITE_ATTEMPTS = 5
+_WRITE_RETRY_DEADLINE = 15 * 60
+
+
+class _WriteRetry:
+    """Decide whether and when to retry a failed PyGithub write."""
+
+    def __init__(self, func: Callable[..., Any], idempotent: bool):
+        self.name = getattr(func, "__name__", repr(func))
+        self.idempotent = idempotent
+        self.attempt = 0
+        self.deadline = time.monotonic() + _WRITE_RETRY_DEADLINE
+
+    def delay(self, error: GithubException) -> Optional[float]:
+        """
+        Get how long to wait before retrying after an error.
+        
+        Args:
+            error: The error the write failed with
+        
+        Returns:
+            Seconds to wait, or None if the error should be raised
+        """
+        delay = self._rate_limit_delay(error)
+        if delay is None:
+            self.attempt += 1
+            # A 403 without rate limit headers is a real error, e.g. missing permissions
+            if (
+                not self.idempotent
+                or error.status not in _RETRYABLE_STATUSES
+                or self.attempt >= _MAX_WRITE_ATTEMPTS
+            ):
+                return None
+            delay = 2 ** self.attempt + random.random()
+        
+        if time.monotonic() + delay > self.deadline:
+            return None
+        
+        logger.warning(f"GitHub returned {error.status} for {self.name}, retrying in {delay:.1f}s")
+        return delay
+
+    @staticmethod
+    def _rate_limit_delay(error: GithubException) -> Optional[float]:
+        """Get how long GitHub asked to wait, or None if the error is not a rate limit."""
+        if error.status not in _RATE_LIMIT_STATUSES:
+            return None
+        headers = {name.lower(): value for name, value in (error.headers or {}).items()}
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+        if headers.get("x-ratelimit-remaining") == "0" and "x-ratelimit-reset" in headers:
+            return max(0.0, float(headers["x-ratelimit-reset"]) - time.time())
+        return None
+
+
+async def run_github_write(
+    func: Callable[..., T], *args: Any, idempotent: bool = False, **kwargs: Any
+) -> T:
+    """
+    Like run_github_call, but retries rate limits and transient errors.
+    
+    Waits for as long as GitHub asks to on rate limits (Retry-After or
+    X-RateLimit-Reset), and backs off exponentially on server errors if the
+    call is idempotent. The waits happen on the event loop instead of holding
+    an executor thread.
+    
+    Args:
+        func: PyGithub method or function to call
+        *args: Positional arguments for the call
+        idempotent: Whether repeating the call has no further effect, e.g.
+            creating a blob, tree or commit
+        **kwargs: Keyword arguments for the call
+    
+    Returns:
+        The call's return value
+    """
+    retry = _WriteRetry(func, idempotent)
+    while True:
+        try:
+            return await run_github_call(func, *args, **kwargs)
+        except GithubException as e:
+            delay = retry.delay(e)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+
+
+# App JWTs are valid for 10 minutes; reuse one until shortly before it expires
+_JWT_LIFETIME = 10 * 60
+_JWT_REFRESH_MARGIN = 30
+_jwt_cache: Optional[Tuple[str, int]] = None
+_jwt_lock = threading.Lock()
+
 
 def create_jwt() -> str:
     """
     Create a JWT for GitHub App authentication.
+    
+    The token is cached and reused until shortly before it expires.
     """
+    global _jwt_cache
+    with _jwt_lock:
+        now = int(time.time())
+        if _jwt_cache and now < _jwt_cache[1] - _JWT_REFRESH_MARGIN:
+            return _jwt_cache[0]
+        
+        token = _sign_jwt(now)
+        if token:
+            _jwt_cache = (token, now + _JWT_LIFETIME)
+        return token
+
+
+def _sign_jwt(now: int) -> str:
+    """Sign a new JWT issued at the given time."""
     try:
         if not config.github.app_id:
             logger.error("Missing GitHub App ID")
             return ""
-        if not config.github.private_key:
+        if not config.github.signing_key:
             logger.error("Missing GitHub App private key")
             return ""
             
         logger.debug(f"Creating JWT with app_id: {config.github.app_id}")
         
-        now = int(time.time())
         payload = {
             "iat": now,
-            "exp": now + (10 * 60),  # 10 minutes expiration
+            "exp": now + _JWT_LIFETIME,  # 10 minutes expiration
             "iss": str(config.github.app_id)  # Ensure app_id is string
         }
         
         logger.debug(f"JWT payload: {payload}")
-        logger.debug(f"Private key length: {len(config.github.private_key)}")
-        
         token = jwt.encode(
             payload, 
-            config.github.private_key, 
+            config.github.signing_key, 
             algorithm="RS256"
         )
         
@@ -59,7 +198,148 @@ def create_jwt() -> str:
         return ""
 
 
-def get_installation_id(owner: str, repo: str) -> Optional[int]:
+# Installation tokens are valid for an hour; reuse them until shortly before
+# they expire. The margin leaves room for a whole job, including a 10 minute
+# Aider run, to finish with the token. Maps installation ID to
+# (token, expiry as a Unix timestamp).
+_INSTALLATION_TOKEN_REFRESH_MARGIN = 15 * 60
+_installation_tokens: Dict[int, Tuple[str, float]] = {}
+
+# Which installation a repository belongs to rarely changes; maps
+# (owner, repo) to (installation ID, time it was looked up)
+_INSTALLATION_ID_TTL = 60 * 60
+_installation_ids: Dict[Tuple[str, str], Tuple[int, float]] = {}
+
+# Repository configs, keyed by (owner, repo), as (config, time it was fetched)
+_REPO_CONFIG_TTL = 5 * 60
+_repo_configs: Dict[Tuple[str, str], Tuple[Dict[str, Any], float]] = {}
+
+# Upper bound on the entries of each per-repository cache
+_MAX_CACHED_REPOS = 1024
+
+
+def _cache_put(cache: Dict[Any, Tuple[Any, float]], key: Any, value: Any, ttl: float) -> None:
+    """
+    Store a value with the current time in a per-repository cache.
+    
+    Entries are kept in the order they were stored, so expired entries, and
+    the oldest ones beyond the size limit, are dropped from the front.
+    
+    Args:
+        cache: Cache mapping keys to (value, time stored)
+        key: Key to store the value under
+        value: Value to store
+        ttl: Seconds after which entries expire
+    """
+    now = time.time()
+    cache.pop(key, None)
+    cache[key] = (value, now)
+    for oldest_key, (_, stored_at) in list(cache.items()):
+        if now < stored_at + ttl and len(cache) <= _MAX_CACHED_REPOS:
+            break
+        del cache[oldest_key]
+
+
+def _get_access_token(integration: GithubIntegration, installation_id: int) -> str:
+    """
+    Get an access token for an installation, reusing a cached one if still valid.
+    
+    Args:
+        integration: GitHub App integration
+        installation_id: GitHub App installation ID
+        
+    Returns:
+        Installation access token
+    """
+    cached = _installation_tokens.get(installation_id)
+    if cached and time.time() < cached[1] - _INSTALLATION_TOKEN_REFRESH_MARGIN:
+        return cached[0]
+    
+    access_token = integration.get_access_token(installation_id)
+    _installation_tokens[installation_id] = (
+        access_token.token,
+        access_token.expires_at.timestamp(),
+    )
+    return access_token.token
+
+
+# Recently used repositories, keyed by (access token, full name), so later
+# events can revalidate them with a conditional request instead of fetching
+# them again; a 304 response does not count against the rate limit
+_MAX_CACHED_REPOSITORIES = 128
+_repositories: "OrderedDict[Tuple[str, str], Repository]" = OrderedDict()
+_repositories_lock = threading.Lock()
+
+
+def get_repository(gh: Github, access_token: str, repo_name: str) -> Repository:
+    """
+    Get a repository, revalidating a cached copy with its ETag if there is one.
+    
+    Args:
+        gh: GitHub client for the installation
+        access_token: Access token the client was created with
+        repo_name: Full name of the repository
+        
+    Returns:
+        The repository
+    """
+    key = (access_token, repo_name)
+    with _repositories_lock:
+        repository = _repositories.get(key)
+    
+    if repository is not None:
+        # Sends If-None-Match and only updates the attributes if they changed
+        repository.update()
+    else:
+        repository = gh.get_repo(repo_name)
+    
+    with _repositories_lock:
+        _repositories[key] = repository
+        _repositories.move_to_end(key)
+        while len(_repositories) > _MAX_CACHED_REPOSITORIES:
+            _repositories.popitem(last=False)
+    
+    return repository
+
+
+# Shared HTTP session for GitHub API calls, so connections are kept alive
+# between requests; created lazily so it binds to the running event loop
+_http_session: Optional[aiohttp.ClientSession] = None
+
+
+def _get_http_session() -> aiohttp.ClientSession:
+    """Get the shared HTTP session for GitHub API calls."""
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        _http_session = aiohttp.ClientSession(
+            headers={"Accept": "application/vnd.github.v3+json"},
+            timeout=aiohttp.ClientTimeout(total=10),
+        )
+    return _http_session
+
+
+async def close_http_session() -> None:
+    """Close the shared HTTP session, if one was opened."""
+    global _http_session
+    if _http_session is not None:
+        await _http_session.close()
+        _http_session = None
+
+
+def get_installation_api(access_token: str) -> GitHubAPI:
+    """
+    Get an async GitHub API client for an installation.
+    
+    Args:
+        access_token: Installation access token
+        
+    Returns:
+        A gidgethub client using the shared HTTP session
+    """
+    return GitHubAPI(_get_http_session(), "github-aider-bot", oauth_token=access_token)
+
+
+async def get_installation_id(owner: str, repo: str) -> Optional[int]:
     """
     Get the installation ID for a repository.
     
@@ -71,17 +351,14 @@ def get_installation_id(owner: str, repo: str) -> Optional[int]:
         Installation ID if found, None otherwise
     """
     token = create_jwt()
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Accept": "application/vnd.github.v3+json"
-    }
+    headers = {"Authorization": f"Bearer {token}"}
     
     url = f"https://api.github.com/repos/{owner}/{repo}/installation"
     
     try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        return response.json().get("id")
+        async with _get_http_session().get(url, headers=headers) as response:
+            response.raise_for_status()
+            return (await response.json()).get("id")
     except Exception as e:
         logger.error(f"Failed to get installation ID: {e}")
         return None
@@ -101,8 +378,7 @@ def get_installation_token(installation_id: int) -> Optional[str]:
     integration = GithubIntegration(config.github.app_id, config.github.private_key)
     
     try:
-        access_token = integration.get_access_token(installation_id)
-        return access_token.token
+        return _get_access_token(integration, installation_id)
     except Exception as e:
         logger.error(f"Failed to get installation token: {e}")
         return None
@@ -117,23 +393,59 @@ async def get_installation_client(owner: str, repo: str) -> Tuple[Github, str]:
             config.github.private_key
         )
         
-        # Get installation
-        installation = integration.get_repo_installation(owner, repo)
+        # Get installation, looking it up only if not cached recently
+        cached = _installation_ids.get((owner, repo))
+        if cached and time.time() < cached[1] + _INSTALLATION_ID_TTL:
+            installation_id = cached[0]
+        else:
+            installation = await run_github_call(integration.get_repo_installation, owner, repo)
+            installation_id = installation.id
+            _cache_put(_installation_ids, (owner, repo), installation_id, _INSTALLATION_ID_TTL)
         
         # Get access token
-        access_token = integration.get_access_token(installation.id)
+        access_token = await run_github_call(_get_access_token, integration, installation_id)
         
-        # Create GitHub client with installation token
-        return Github(access_token.token), access_token.token
+        # Create GitHub client with installation token. PyGithub's own retries
+        # are disabled, so writes are retried by run_github_write only
+        return Github(access_token, retry=None), access_token
         
     except Exception as e:
         logger.exception(f"Error getting installation client: {e}")
+        # The app may have been uninstalled or moved, look it up again next time
+        cached = _installation_ids.pop((owner, repo), None)
+        if cached:
+            _installation_tokens.pop(cached[0], None)
         return None, None
 
 
 async def get_repo_config(owner: str, repo: str, client: GitHubAPI) -> Dict[str, Any]:
     """
     Get repository configuration from .github/aider-bot.yml
+    
+    The config is cached per repository for a few minutes.
+    """
+    cached = _repo_configs.get((owner, repo))
+    if cached and time.time() < cached[1] + _REPO_CONFIG_TTL:
+        return cached[0]
+    
+    try:
+        repo_config = await _fetch_repo_config(owner, repo, client)
+    except Exception as e:
+        # Use the defaults this time, but don't cache them for a transient error
+        logger.warning(f"Failed to get config for {owner}/{repo}: {e}")
+        return {}
+    
+    _cache_put(_repo_configs, (owner, repo), repo_config, _REPO_CONFIG_TTL)
+    return repo_config
+
+
+async def _fetch_repo_config(owner: str, repo: str, client: GitHubAPI) -> Dict[str, Any]:
+    """
+    Fetch and parse .github/aider-bot.yml from the repository.
+    
+    Raises:
+        gidgethub.BadRequest: If the request fails for a reason other than
+            the file not existing
     """
     try:
         # Try to get config file
@@ -141,19 +453,20 @@ async def get_repo_config(owner: str, repo: str, client: GitHubAPI) -> Dict[str,
             f"/repos/{owner}/{repo}/contents/.github/aider-bot.yml",
             accept="application/vnd.github.v3+json"
         )
+    except BadRequest as e:
+        if e.status_code != HTTPStatus.NOT_FOUND:
+            raise
+        config_content = None
+    
+    if config_content:
+        import base64
         
-        if config_content:
-            import yaml
-            import base64
-            
-            # Decode content
-            content = base64.b64decode(config_content["content"]).decode()
-            
-            # Parse YAML
-            return yaml.safe_load(content) or {}
-            
-    except Exception as e:
-        logger.info(f"No config found for {owner}/{repo}: {e}")
+        # Decode content
+        content = base64.b64decode(config_content["content"]).decode()
+        
+        # Parse YAML
+        return safe_load_yaml(content) or {}
     
     # Return default config if none found
+    logger.info(f"No config found for {owner}/{repo}")
     return {}
@@ -0,0 +1,56 @@
+"""
+GitHub webhook event types.
+
+Only the fields the bot actually uses are declared; everything else in the
+payload is skipped while decoding.
+"""
+from typing import List, Optional
+
+import msgspec
+
+
+class Label(msgspec.Struct):
+    """A label attached to an issue."""
+    name: str
+
+
+class Issue(msgspec.Struct):
+    """The issue an event refers to."""
+    number: int
+    title: str
+    body: Optional[str] = None
+    labels: List[Label] = []
+
+
+class Repository(msgspec.Struct):
+    """The repository an event was delivered for."""
+    full_name: str
+
+
+class Installation(msgspec.Struct):
+    """The GitHub App installation an event was delivered for."""
+    id: int
+
+
+class WebhookEvent(msgspec.Struct):
+    """A webhook delivery payload."""
+    action: Optional[str] = None
+    issue: Optional[Issue] = None
+    repository: Optional[Repository] = None
+    installation: Optional[Installation] = None
+
+
+def decode_event(body: bytes) -> WebhookEvent:
+    """
+    Decode a webhook request body.
+
+    Args:
+        body: Raw request body
+
+    Returns:
+        The decoded webhook event
+
+    Raises:
+        msgspec.DecodeError: If the body is not valid JSON or has the wrong shape
+    """
+    return msgspec.json.decode(body, type=WebhookEvent)
@@ -1,55 +1,100 @@
 """
 GitHub issues handling module.
 """
+import asyncio
+import base64
 import logging
-import re
 import os
-import tempfile
-from typing import Dict, Any, List, Tuple, Optional
+import time
+from collections import OrderedDict
+from typing import Dict, Any, FrozenSet, List, Set, Tuple, Optional
 
-from github import Github
+from git import Repo
+from github import Github, InputGitTreeElement
 from github.Issue import Issue
 from github.Repository import Repository
 from gidgethub.aiohttp import GitHubAPI
-from git import Repo
 
 from src.config import config
-from src.github.app import get_installation_client, get_repo_config
+from src.github.app import (
+    get_installation_api,
+    get_installation_client,
+    get_repo_config,
+    get_repository,
+    run_github_call,
+    run_github_write,
+)
+from src.github.events import WebhookEvent
 from src.analysis.issue_analyzer import analyze_issue
 from src.aider.integration import run_aider_on_issue
-from src.git.operations import checkout_branch, commit_changes
+from src.git.operations import checkout_branch, commit_changes, run_in_git_pool
+from src.git.workspace import workspace_manager
 from src.github.pr import create_pull_request
+from src.worker import Worker
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Blob uploads run in parallel, but stay well below GitHub's secondary rate limits
+_MAX_PARALLEL_UPLOADS = 8
+
+# GitHub redelivers webhooks that time out or fail; remember recent delivery
+# IDs so a retry does not run Aider on the same issue again
+_DELIVERY_TTL = 60 * 60
+_MAX_RECENT_DELIVERIES = 10_000
+_recent_deliveries: "OrderedDict[str, float]" = OrderedDict()
+
+# Comments posted on the issue while a fix is attempted
+_ANALYZING_COMMENT = (
+    "🤖 I'm analyzing this issue to see if I can help fix it automatically. "
+    "I'll update you shortly."
+)
+_NO_FIX_COMMENT = (
+    "I analyzed the issue but couldn't automatically fix it. "
+    "A human review may be needed."
+)
+
+def _label_sets(repo_config: Dict[str, Any]) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+    """
+    Get the process and ignore labels of a repository config as sets.
+    
+    The sets are stored in the config under "_process_set" and "_ignore_set",
+    so a cached config only converts its label lists once.
+    """
+    if "_process_set" not in repo_config:
+        labels = repo_config.get("labels", {})
+        repo_config["_process_set"] = frozenset(labels.get("process", []))
+        repo_config["_ignore_set"] = frozenset(labels.get("ignore", []))
+    return repo_config["_process_set"], repo_config["_ignore_set"]
+
 
-def should_process_issue(issue: Issue, repo_config: Dict[str, Any]) -> bool:
+def should_process_issue(
+    issue_number: int,
+    issue_labels: Set[str],
+    repo_config: Dict[str, Any]
+) -> bool:
     """
     Determine if an issue should be processed by the bot.
     
     Args:
-        issue: GitHub issue
+        issue_number: Issue number, for logging
+        issue_labels: Names of the issue's labels
         repo_config: Repository configuration
         
     Returns:
         True if the issue should be processed, False otherwise
     """
     # Check for process labels
-    process_labels = repo_config.get("labels", {}).get("process", [])
-    ignore_labels = repo_config.get("labels", {}).get("ignore", [])
-    
-    # Get issue labels
-    issue_labels = [label.name for label in issue.labels]
+    process_labels, ignore_labels = _label_sets(repo_config)
     
     # If the issue has any ignore labels, don't process it
-    if any(label in issue_labels for label in ignore_labels):
-        logger.info(f"Issue {issue.number} has ignore label, skipping")
+    if issue_labels & ignore_labels:
+        logger.info(f"Issue {issue_number} has ignore label, skipping")
         return False
     
     # If process labels are specified, only process issues with those labels
-    if process_labels and not any(label in issue_labels for label in process_labels):
-        logger.info(f"Issue {issue.number} doesn't have any process labels, skipping")
+    if process_labels and not issue_labels & process_labels:
+        logger.info(f"Issue {issue_number} doesn't have any process labels, skipping")
         return False
     
     return True
@@ -69,8 +114,11 @@ def extract_issue_details(
     Returns:
         Tuple of (should_process, issue_details)
     """
+    # Walk the labels once; they are needed for the check and the details
+    labels = [label.name for label in issue.labels]
+    
     # Check if we should process this issue
-    if not should_process_issue(issue, repo_config):
+    if not should_process_issue(issue.number, set(labels), repo_config):
         return False, {}
     
     # Extract issue details
@@ -82,7 +130,7 @@ def extract_issue_details(
         "user": issue.user.login,
         "created_at": issue.created_at.isoformat(),
         "updated_at": issue.updated_at.isoformat(),
-        "labels": [label.name for label in issue.labels],
+        "labels": labels,
     }
     
     # Analyze the issue to determine if it's actionable
@@ -94,129 +142,305 @@ def extract_issue_details(
     return True, issue_details
 
 
-async def process_issue_event(payload: Dict[str, Any]):
-    """Process an issue event."""
+def is_duplicate_delivery(delivery_id: Optional[str]) -> bool:
+    """
+    Check whether a webhook delivery was already seen, and remember it if not.
+    
+    Args:
+        delivery_id: Value of the X-GitHub-Delivery header
+        
+    Returns:
+        True if the delivery was seen within the last hour, False otherwise
+    """
+    if not delivery_id:
+        return False
+    
+    now = time.monotonic()
+    # Drop expired deliveries; the oldest ones are at the front
+    while _recent_deliveries:
+        oldest_id, seen_at = next(iter(_recent_deliveries.items()))
+        if now - seen_at < _DELIVERY_TTL and len(_recent_deliveries) < _MAX_RECENT_DELIVERIES:
+            break
+        del _recent_deliveries[oldest_id]
+    
+    if delivery_id in _recent_deliveries:
+        return True
+    
+    _recent_deliveries[delivery_id] = now
+    return False
+
+
+async def process_issue_event(payload: WebhookEvent, delivery_id: Optional[str] = None) -> bool:
+    """
+    Process an issue event.
+    
+    The event is queued for the issue worker, which runs fix_issue_job in the
+    background; this returns as soon as the job is queued.
+    
+    Args:
+        payload: Webhook event
+        delivery_id: Value of the X-GitHub-Delivery header, used to drop
+            redeliveries of an event that was already queued
+        
+    Returns:
+        True if the event was queued, False if it was a duplicate delivery
+    """
+    if is_duplicate_delivery(delivery_id):
+        logger.info(f"Ignoring duplicate delivery {delivery_id}")
+        return False
+    
+    logger.info(f"Queueing issue #{payload.issue.number} from {payload.repository.full_name}")
+    issue_worker.enqueue(payload)
+    return True
+
+
+def _upload_blob(repository: Repository, full_path: str) -> str:
+    """Upload a file from the working tree as a blob and return its SHA."""
+    with open(full_path, "rb") as f:
+        content = base64.b64encode(f.read()).decode("ascii")
+    return repository.create_git_blob(content, "base64").sha
+
+
+def _is_inside_worktree(repo_path: str, file_path: str) -> bool:
+    """
+    Check that a path resolves to a regular file inside the working tree.
+    
+    Absolute paths, ".." components and symlinks are resolved first, so none
+    of them can point the upload at a file outside the working tree, such as
+    the app's private key.
+    
+    Args:
+        repo_path: Path to the working tree
+        file_path: Path relative to the working tree
+        
+    Returns:
+        True if the file can be uploaded
+    """
+    root = os.path.realpath(repo_path)
+    full_path = os.path.join(root, file_path)
+    if os.path.islink(full_path):
+        return False
+    resolved = os.path.realpath(full_path)
+    return resolved.startswith(root + os.sep) and os.path.isfile(resolved)
+
+
+def _changed_files(repo_path: str) -> List[str]:
+    """
+    List the files changed in a working tree, as reported by git.
+    
+    Args:
+        repo_path: Path to the working tree
+        
+    Returns:
+        Paths of the modified, added and untracked files, relative to the
+        working tree; deleted files are not included
+    """
+    git = Repo(repo_path).git
+    # -z keeps paths unquoted, whatever characters they contain
+    tracked = git.diff("--name-only", "-z", "--diff-filter=d", "HEAD")
+    untracked = git.ls_files("--others", "--exclude-standard", "-z")
+    return [path for path in (tracked + "\0" + untracked).split("\0") if path]
+
+
+async def push_changes(
+    repository: Repository,
+    repo_path: str,
+    branch_name: str,
+    message: str,
+) -> Optional[str]:
+    """
+    Create a branch with the changed files in a single commit.
+    
+    The changed files are taken from git rather than from Aider's output, and
+    are read from the working tree and committed through the Git Data API,
+    so the number of API calls grows with the number of blobs only, instead
+    of a contents lookup plus a commit per file. Blobs are uploaded in
+    parallel. The commit's parent is the working tree's HEAD, the commit the
+    files were edited from, so changes pushed to the branch meanwhile are
+    not reverted.
+    
+    Args:
+        repository: GitHub repository
+        repo_path: Path to the working tree with the changed files
+        branch_name: Branch to create
+        message: Commit message
+        
+    Returns:
+        SHA of the new commit, or None if no files were changed
+    """
+    upload_slots = asyncio.Semaphore(_MAX_PARALLEL_UPLOADS)
+    
+    async def upload(file_path: str) -> InputGitTreeElement:
+        full_path = os.path.join(repo_path, file_path)
+        async with upload_slots:
+            # Read the file on the executor thread too, so only the files
+            # being uploaded are held in memory, and never on the event loop
+            sha = await run_github_write(_upload_blob, repository, full_path, idempotent=True)
+        mode = "100755" if os.access(full_path, os.X_OK) else "100644"
+        return InputGitTreeElement(file_path, mode, "blob", sha=sha)
+    
+    existing_paths = []
+    for file_path in await run_in_git_pool(_changed_files, repo_path):
+        if _is_inside_worktree(repo_path, file_path):
+            existing_paths.append(file_path)
+        else:
+            logger.warning(f"Skipping {file_path}: not a regular file inside the working tree")
+    
+    if not existing_paths:
+        return None
+    
+    elements = await asyncio.gather(*(upload(file_path) for file_path in existing_paths))
+    
+    base_sha = await run_in_git_pool(lambda: Repo(repo_path).head.commit.hexsha)
+    base_commit = await run_github_call(repository.get_git_commit, base_sha)
+    # Blobs, trees and commits are content-addressed, so repeating them is safe
+    tree = await run_github_write(
+        repository.create_git_tree, elements, base_commit.tree, idempotent=True
+    )
+    commit = await run_github_write(
+        repository.create_git_commit, message, tree, [base_commit], idempotent=True
+    )
+    await run_github_write(
+        repository.create_git_ref, ref=f"refs/heads/{branch_name}", sha=commit.sha
+    )
+    
+    logger.info(f"Pushed {len(elements)} files to {branch_name} ({commit.sha[:7]})")
+    return commit.sha
+
+
+async def _post_status_comment(repository: Repository, issue_number: int, body: str) -> Issue:
+    """Fetch an issue and comment on it; returns the issue for later comments."""
+    issue = await run_github_call(repository.get_issue, issue_number)
+    await run_github_write(issue.create_comment, body)
+    return issue
+
+
+async def fix_issue_job(payload: WebhookEvent):
+    """Check out the repository, run Aider on the issue and open a pull request."""
+    status_comment = None
     try:
         # Extract repository and issue information
-        repo_name = payload["repository"]["full_name"]
+        repo_name = payload.repository.full_name
         owner, repo = repo_name.split("/")
-        issue_number = payload["issue"]["number"]
+        issue_number = payload.issue.number
         
         logger.info(f"Processing issue #{issue_number} from {repo_name}")
         
+        # Analyze the issue before doing any expensive work
+        issue_details = {
+            "number": issue_number,
+            "title": payload.issue.title,
+            "body": payload.issue.body or "",
+            **analyze_issue(payload.issue.body or ""),
+        }
+        if not issue_details["is_fixable"]:
+            logger.info(
+                f"Skipping issue #{issue_number}: not fixable "
+                f"(fix_potential={issue_details['fix_potential']:.2f})"
+            )
+            return
+        
         # Get GitHub client and token for the installation
         gh, access_token = await get_installation_client(owner, repo)
         if not gh or not access_token:
             logger.error(f"Failed to get GitHub client for {repo_name}")
             return
-            
-        # Get repository and issue objects
-        repository = gh.get_repo(repo_name)
-        issue = repository.get_issue(issue_number)
-        
-        # Create a temporary directory for the repository
-        with tempfile.TemporaryDirectory() as temp_dir:
-            logger.info(f"Cloning repository to {temp_dir}")
-            
-            # Get the clone URL with auth token
-            clone_url = repository.clone_url.replace(
-                "https://",
-                f"https://x-access-token:{access_token}@"
-            )
-            
-            logger.debug(f"Using clone URL (redacted): {clone_url.replace(access_token, 'TOKEN')}")
-            
-            # Clone the repository
-            repo = Repo.clone_from(
-                clone_url,
-                temp_dir,
-                branch=repository.default_branch
-            )
-            
-            logger.info(f"Successfully cloned repository to {temp_dir}")
-            
-            # Extract file paths from issue body
-            file_paths = []
-            if "package.json" in payload["issue"]["body"].lower():
-                file_paths.append("package.json")
-            
-            # Add issue details with file paths
-            issue_details = {
-                **payload["issue"],
-                "file_paths": file_paths or ["package.json"]  # Default to package.json if no files found
-            }
-            
-            # Add a comment that we're working on it
-            issue.create_comment(
-                "🤖 I'm analyzing this issue to see if I can help fix it automatically. I'll update you shortly."
-            )
-            
+        
+        # Honour the repository's label filters before doing any work on it
+        repo_config = await get_repo_config(owner, repo, get_installation_api(access_token))
+        issue_labels = {label.name for label in payload.issue.labels}
+        if not should_process_issue(issue_number, issue_labels, repo_config):
+            return
+        
+        # Get repository object
+        repository = await run_github_call(get_repository, gh, access_token, repo_name)
+        
+        # Add a comment that we're working on it; it is posted while the
+        # repository is checked out, and awaited before any later comment
+        status_comment = asyncio.create_task(_post_status_comment(
+            repository,
+            issue_number,
+            _ANALYZING_COMMENT,
+        ))
+        
+        # Get the clone URL with auth token
+        clone_url = repository.clone_url.replace(
+            "https://",
+            f"https://x-access-token:{access_token}@"
+        )
+        
+        logger.debug(f"Using clone URL (redacted): {clone_url.replace(access_token, 'TOKEN')}")
+        
+        # Check out the default branch from the repository cache
+        async with workspace_manager.worktree_async(
+            owner, repo, clone_url, repository.default_branch
+        ) as repo_path:
             # Run Aider on the issue
             success, changes, solution_description = await run_aider_on_issue(
-                repo_path=temp_dir,
+                repo_path=repo_path,
                 issue_details=issue_details,
-                repo_config={}
+                repo_config=repo_config
             )
 
             if success and changes:
-                # Create a branch name from issue
+                # Create a branch name from issue; the number is decoded as an
+                # int, so the name is always a valid ref without sanitizing it
                 branch_name = f"fix/issue-{issue_number}"
-                base_branch = repository.default_branch
+                # Used for both the commit message and the PR title
+                fix_title = f"Fix #{issue_number}: {payload.issue.title}"
                 
-                # Create branch from default branch
-                base_ref = repository.get_git_ref(f"heads/{base_branch}")
-                repository.create_git_ref(
-                    ref=f"refs/heads/{branch_name}",
-                    sha=base_ref.object.sha
+                # Commit the edited files onto a new branch from the default branch
+                commit_sha = await push_changes(
+                    repository,
+                    repo_path,
+                    branch_name,
+                    fix_title,
                 )
+                if not commit_sha:
+                    raise RuntimeError("Aider reported changes, but no changed files were found")
                 
-                # Create/update the files
-                for file_path, content in changes.items():
-                    try:
-                        # Try to get existing file
-                        file = repository.get_contents(file_path, ref=branch_name)
-                        repository.update_file(
-                            file_path,
-                            f"Update {file_path} for issue #{issue_number}",
-                            content,
-                            file.sha,
-                            branch=branch_name
-                        )
-                    except:
-                        # File doesn't exist, create it
-                        repository.create_file(
-                            file_path,
-                            f"Create {file_path} for issue #{issue_number}",
-                            content,
-                            branch=branch_name
-                        )
-                
-                # Create the pull request
-                pr = repository.create_pull(
-                    title=f"Fix #{issue_number}: {payload['issue']['title']}",
-                    body=solution_description,
-                    head=branch_name,
-                    base=base_branch
+                # Create the pull request; its body closes the issue on merge
+                pr_url = await create_pull_request(
+                    repository,
+                    branch_name,
+                    issue_number,
+                    fix_title,
+                    solution_description or "",
+                    repo_config,
                 )
+                if not pr_url:
+                    raise RuntimeError(f"Failed to create a pull request for branch {branch_name}")
                 
                 # Add comment to issue
-                issue.create_comment(
-                    f"I've created PR #{pr.number} with a fix for this issue.\n\n{solution_description}"
+                issue = await status_comment
+                await run_github_write(
+                    issue.create_comment,
+                    f"I've created {pr_url} with a fix for this issue.\n\n{solution_description or ''}".rstrip()
                 )
                 
             else:
                 # Add comment that no changes were made
-                issue.create_comment(
-                    "I analyzed the issue but couldn't automatically fix it. A human review may be needed."
+                issue = await status_comment
+                await run_github_write(
+                    issue.create_comment,
+                    _NO_FIX_COMMENT
                 )
 
     except Exception as e:
         logger.exception(f"Error processing issue: {e}")
+        if status_comment is not None:
+            # Keep the status comment ahead of the error comment
+            await asyncio.gather(status_comment, return_exceptions=True)
         # Add error comment to issue
         try:
-            issue = repository.get_issue(issue_number)
-            issue.create_comment(
+            issue = await run_github_call(repository.get_issue, issue_number)
+            await run_github_write(
+                issue.create_comment,
                 f"Sorry, I encountered an error while trying to fix this issue:\n```\n{str(e)}\n```"
             )
         except Exception as comment_error:
             logger.exception("Failed to post error comment", exc_info=comment_error)
+
+
+# Runs fix_issue_job for queued issue events
+issue_worker = Worker(fix_issue_job, "issue", concurrency=config.server.issue_workers)
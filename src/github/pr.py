@@ -6,11 +6,13 @@ from typing import Dict, Any, List, Optional
 
 from github.Repository import Repository
 
+from src.github.app import run_github_call, run_github_write
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
 
-def create_pull_request(
+async def create_pull_request(
     repository: Repository,
     branch_name: str,
     issue_number: int,
@@ -26,7 +28,7 @@ def create_pull_request(
         branch_name: Branch name
         issue_number: Related issue number
         title: PR title
-        body: PR body
+        body: PR body, may be empty
         repo_config: Repository configuration
         
     Returns:
@@ -40,8 +42,13 @@ def create_pull_request(
         pr_config = repo_config.get("pr", {})
         draft = pr_config.get("draft", False)
         
+        # Link PR to issue, so merging it closes the issue
+        if issue_number:
+            body = f"{body}\n\nCloses #{issue_number}" if body else f"Closes #{issue_number}"
+        
         # Create the pull request
-        pr = repository.create_pull(
+        pr = await run_github_write(
+            repository.create_pull,
             title=title,
             body=body,
             head=branch_name,
@@ -49,15 +56,11 @@ def create_pull_request(
             draft=draft,
         )
         
-        # Link PR to issue
-        if issue_number:
-            pr.as_issue().edit(body=f"{body}\n\nCloses #{issue_number}")
-        
         # Add reviewers if specified
         reviewers = pr_config.get("reviewers", [])
         if reviewers:
             try:
-                pr.create_review_request(reviewers=reviewers)
+                await run_github_call(pr.create_review_request, reviewers=reviewers)
             except Exception as e:
                 logger.warning(f"Failed to add reviewers: {e}")
         
@@ -65,7 +68,7 @@ def create_pull_request(
         labels = pr_config.get("labels", [])
         if labels:
             try:
-                pr.add_to_labels(*labels)
+                await run_github_call(pr.add_to_labels, *labels)
             except Exception as e:
                 logger.warning(f"Failed to add labels: {e}")
         
@@ -0,0 +1,29 @@
+"""
+Server runtime selection module.
+"""
+from typing import Dict
+
+
+def uvicorn_runtime() -> Dict[str, str]:
+    """
+    Choose the event loop and HTTP parser for uvicorn.
+    
+    Prefers the uvloop event loop and httptools parser, falling back to the
+    pure-Python implementations where they are unavailable (e.g. Windows).
+    
+    Returns:
+        Keyword arguments for uvicorn.run (``loop`` and ``http``)
+    """
+    try:
+        import uvloop  # noqa: F401
+        loop = "uvloop"
+    except ImportError:
+        loop = "asyncio"
+    
+    try:
+        import httptools  # noqa: F401
+        http = "httptools"
+    except ImportError:
+        http = "h11"
+    
+    return {"loop": loop, "http": http}
@@ -0,0 +1,80 @@
+"""
+Background worker module.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, List, Optional
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class Worker:
+    """
+    Run jobs from an in-process queue in the background.
+
+    A pool of worker tasks takes jobs from the queue in the order they were
+    enqueued, so up to ``concurrency`` jobs are handled at the same time. The
+    queue and the worker tasks are created on first use, so they belong to
+    the event loop that is running at that point.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Any], Awaitable[None]],
+        name: str,
+        concurrency: int = 1,
+    ):
+        self.handler = handler
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def _ensure_started(self) -> None:
+        """Start the worker tasks on the running event loop, if not done yet."""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._tasks = [loop.create_task(self._run()) for _ in range(self.concurrency)]
+        logger.info(f"Started {self.concurrency} {self.name} workers")
+
+    def enqueue(self, job: Any) -> None:
+        """
+        Add a job to the queue and return immediately.
+
+        Args:
+            job: Argument for the handler
+        """
+        self._ensure_started()
+        self._queue.put_nowait(job)
+        logger.info(f"Queued {self.name} job ({self._queue.qsize()} waiting)")
+
+    async def _run(self) -> None:
+        """Handle jobs from the queue until cancelled."""
+        while True:
+            job = await self._queue.get()
+            try:
+                await self.handler(job)
+            except Exception as e:
+                logger.exception(f"Error in {self.name} job: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def join(self) -> None:
+        """Wait until every queued job has been handled."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def stop(self) -> None:
+        """Cancel the worker tasks; jobs still in the queue are dropped."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._loop = None
+        self._queue = None
+        self._tasks = []
@@ -1,28 +1,33 @@
 """
 End-to-end integration tests for the GitHub Aider Bot.
 """
+import asyncio
+import base64
+import hashlib
+import hmac
 import json
 import logging
 import os
 import time
 import unittest
-from unittest.mock import patch, MagicMock
+from contextlib import asynccontextmanager
+from unittest.mock import patch, AsyncMock, MagicMock
 
 import pytest
 import requests
 from fastapi.testclient import TestClient
+from git import Repo
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 
-# Import app
-import sys
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../src')))
-
-from app import app
-from config import config
-from github.issues import process_issue_event
-from aider.integration import run_aider_on_issue
+import src.app
+from src.app import app
+from src.config import config
+from src.github.events import decode_event
+from src.github.issues import fix_issue_job, process_issue_event
+from src.git.workspace import workspace_manager
+from src.aider.integration import run_aider_on_issue
 
 
 class TestEndToEnd(unittest.TestCase):
@@ -36,7 +41,7 @@ class TestEndToEnd(unittest.TestCase):
         """Test the health check endpoint."""
         response = self.client.get("/health")
         assert response.status_code == 200
-        assert response.json() == {"status": "healthy"}
+        assert response.json() == {"status": "ok"}
     
     def test_root(self):
         """Test the root endpoint."""
@@ -70,103 +75,149 @@ class TestEndToEnd(unittest.TestCase):
         }
         
         # Mock the verify_webhook function to always return the payload
-        with patch('app.verify_webhook', return_value=payload):
+        with patch('src.app.verify_webhook', return_value=payload):
             response = self.client.post("/webhook", json=payload)
-            assert response.status_code == 200
+            assert response.status_code == 202
             assert response.json()["status"] == "processing"
             assert response.json()["issue_number"] == 1
     
-    @pytest.mark.skipif(not os.environ.get("AIDER_API_KEY"), reason="No Aider API key")
-    def test_aider_integration(self):
-        """Test Aider integration."""
-        # Mock issue details
-        issue_details = {
-            "number": 1,
-            "title": "Fix the bug in app.py",
-            "body": "There's a bug in app.py that causes an error when processing webhooks.",
-            "file_paths": ["app.py"],
-            "error_messages": ["KeyError: 'action'"],
-            "code_blocks": ["def webhook_handler(payload):\n    action = payload['action']\n    return action"],
-            "is_fixable": True,
-            "fix_potential": 0.8,
-        }
-        
-        # Mock repo config
-        repo_config = {
-            "labels": {
-                "process": ["bug", "fix-me"],
-                "ignore": ["discussion", "wontfix"]
-            },
-            "files": {
-                "include": ["**"],
-                "exclude": []
-            },
-            "pr": {
-                "draft": False,
-                "reviewers": []
-            }
+    def test_webhook_duplicate_delivery(self):
+        """Test that a redelivered event is not queued a second time."""
+        payload = {
+            "action": "opened",
+            "issue": {"number": 2, "title": "Duplicate", "body": ""},
+            "repository": {"full_name": "test/repo"},
         }
-        
-        # Create a temp directory with a mock repo
-        import tempfile
-        import os
-        import shutil
-        
-        repo_dir = tempfile.mkdtemp(prefix="aider-bot-test-")
-        try:
-            # Create a mock app.py file with a bug
-            os.makedirs(os.path.join(repo_dir, "src"), exist_ok=True)
-            with open(os.path.join(repo_dir, "src", "app.py"), "w") as f:
-                f.write("""
-def webhook_handler(payload):
+        headers = {"X-GitHub-Event": "issues", "X-GitHub-Delivery": "delivery-dedup-test"}
+        with patch.object(config.github, "webhook_secret", ""), \
+                patch("src.github.issues.issue_worker") as worker:
+            first = self.client.post("/webhook", json=payload, headers=headers)
+            second = self.client.post("/webhook", json=payload, headers=headers)
+        assert first.status_code == 202
+        assert second.status_code == 200
+        assert second.json() == {"status": "ignored", "reason": "Duplicate delivery"}
+        worker.enqueue.assert_called_once()
+    
+    def test_webhook_invalid_payload(self):
+        """Test that a payload with the wrong shape is rejected."""
+        with patch.object(config.github, "webhook_secret", ""):
+            response = self.client.post("/webhook", json={"action": "opened", "issue": {"number": "one"}})
+            assert response.status_code == 400
+    
+    def test_webhook_issue_without_repository(self):
+        """Test that an issue event without a repository is rejected."""
+        payload = {"action": "opened", "issue": {"number": 3, "title": "No repository"}}
+        with patch.object(config.github, "webhook_secret", ""), \
+                patch("src.github.issues.issue_worker") as worker:
+            response = self.client.post(
+                "/webhook", json=payload, headers={"X-GitHub-Event": "issues"}
+            )
+        assert response.status_code == 400
+        worker.enqueue.assert_not_called()
+    
+    def test_webhook_ignores_unhandled_events(self):
+        """Test that unhandled event types are ignored without reading the body."""
+        with patch("src.app.parse_webhook_body") as parse_webhook_body:
+            response = self.client.post(
+                "/webhook", content=b"not json", headers={"X-GitHub-Event": "push"}
+            )
+            assert response.status_code == 200
+            assert response.json()["status"] == "ignored"
+            parse_webhook_body.assert_not_called()
+    
+    def test_webhook_signature(self):
+        """Test that only correctly signed webhooks are accepted."""
+        body = b'{"action": "closed"}'
+        signature = hmac.new(b"secret", body, hashlib.sha256).hexdigest()
+        with patch.object(config.github, "webhook_secret", "secret"), \
+                patch.object(src.app, "_WEBHOOK_SECRET_BYTES", b"secret"):
+            for header, status_code in [
+                (f"sha256={signature}", 200),
+                (f"sha256={signature[::-1]}", 401),
+                ("sha256=not-hex", 401),
+                ("sha256", 401),
+            ]:
+                response = self.client.post(
+                    "/webhook",
+                    content=body,
+                    headers={"X-GitHub-Event": "issues", "X-Hub-Signature-256": header},
+                )
+                assert response.status_code == status_code
+
+
+BUGGY_APP = """def webhook_handler(payload):
     # This will raise a KeyError if 'action' is not in payload
     action = payload['action']
     return action
-""")
-            
-            # Mock the run_aider_on_issue function to not actually run Aider but return a mock fix
-            with patch('aider.integration.run_aider_on_issue', return_value=(True, {
-                "src/app.py": """
-diff --git a/src/app.py b/src/app.py
-index 1234567..890abcd 100644
---- a/src/app.py
-+++ b/src/app.py
-@@ -1,4 +1,5 @@
- def webhook_handler(payload):
--    # This will raise a KeyError if 'action' is not in payload
--    action = payload['action']
-+    # Check if 'action' is in payload to avoid KeyError
-+    action = payload.get('action', None)
-+    if action is None:
-+        return None
-     return action
 """
-            })):
-                # Test the fix issue function
-                from github.issues import fix_issue
-                
-                # Mock the repository and issue objects
-                repo = MagicMock()
-                repo.clone_url = "https://github.com/test/repo.git"
-                
-                issue = MagicMock()
-                issue.number = 1
-                
-                # Mock other functions that would interact with GitHub
-                with patch('github.pr.create_pull_request', return_value="https://github.com/test/repo/pull/1"):
-                    with patch('git.operations.checkout_branch', return_value=repo_dir):
-                        with patch('git.operations.commit_changes', return_value=True):
-                            # Run the fix_issue function
-                            from github.issues import fix_issue
-                            fix_issue(repo, issue, issue_details, "fix/issue-1", repo_config)
-                            
-                            # Verify that the issue.create_comment was called with success message
-                            assert any("✅" in call[0][0] for call in issue.create_comment.call_args_list)
-        
-        finally:
-            # Clean up the temp directory
-            shutil.rmtree(repo_dir, ignore_errors=True)
 
+FIXED_APP = """def webhook_handler(payload):
+    # Check if 'action' is in payload to avoid KeyError
+    return payload.get('action')
+"""
+
+
+def test_aider_integration(tmp_path):
+    """Test that a fix made by Aider is committed and opened as a pull request."""
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "app.py").write_text(BUGGY_APP)
+    worktree = Repo.init(tmp_path)
+    worktree.index.add(["src/app.py"])
+    checked_out = worktree.index.commit("Initial commit").hexsha
+    
+    payload = decode_event(json.dumps({
+        "action": "opened",
+        "issue": {
+            "number": 1,
+            "title": "Fix the bug in app.py",
+            "body": (
+                "There's a bug in `src/app.py` that causes an error when processing webhooks.\n"
+                "Steps to reproduce: send a webhook without an action\n"
+                "Error: KeyError: 'action'"
+            ),
+        },
+        "repository": {"full_name": "test/repo"},
+    }).encode())
+    
+    async def fake_aider(repo_path, issue_details, repo_config):
+        # Aider edits the files in the working tree it runs in
+        (tmp_path / "src" / "app.py").write_text(FIXED_APP)
+        return True, {"src/app.py": "+    return payload.get('action')"}, "Use payload.get()"
+    
+    @asynccontextmanager
+    async def fake_worktree(owner, repo, clone_url, branch):
+        yield str(tmp_path)
+    
+    gh = MagicMock()
+    repository = gh.get_repo.return_value
+    repository.clone_url = "https://github.com/test/repo.git"
+    repository.default_branch = "main"
+    repository.create_git_blob.return_value.sha = "fedcba9876543210"
+    repository.create_git_commit.return_value.sha = "0123456789abcdef"
+    repository.create_pull.return_value.html_url = "https://github.com/test/repo/pull/2"
+    
+    with patch.multiple(
+        "src.github.issues",
+        get_installation_client=AsyncMock(return_value=(gh, "token")),
+        get_repository=MagicMock(return_value=repository),
+        get_repo_config=AsyncMock(return_value={"pr": {"labels": ["aider-bot"]}}),
+        run_aider_on_issue=fake_aider,
+    ), patch.object(workspace_manager, "worktree_async", fake_worktree):
+        asyncio.run(fix_issue_job(payload))
+    
+    # The fix is committed on top of the commit Aider worked on
+    repository.get_git_commit.assert_called_once_with(checked_out)
+    uploaded = repository.create_git_blob.call_args[0][0]
+    assert base64.b64decode(uploaded).decode() == FIXED_APP
+    repository.create_git_ref.assert_called_once_with(
+        ref="refs/heads/fix/issue-1", sha="0123456789abcdef"
+    )
+    pull = repository.create_pull.call_args.kwargs
+    assert pull["head"] == "fix/issue-1"
+    assert pull["body"] == "Use payload.get()\n\nCloses #1"
+    repository.create_pull.return_value.add_to_labels.assert_called_once_with("aider-bot")
+    comments = [call.args[0] for call in repository.get_issue.return_value.create_comment.call_args_list]
+    assert comments[-1].startswith("I've created https://github.com/test/repo/pull/2")
 
 if __name__ == "__main__":
     unittest.main()
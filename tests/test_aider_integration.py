@@ -0,0 +1,73 @@
+"""
+Unit tests for the Aider integration helpers.
+"""
+import unittest
+
+from src.aider.integration import parse_aider_output, prepare_aider_input
+
+
+ISSUE_DETAILS = {
+    "number": 1,
+    "title": "Fix the bug in app.py",
+    "body": "There's a bug in app.py that causes an error when processing webhooks.",
+    "file_paths": ["app.py"],
+    "error_messages": ["KeyError: 'action'"],
+}
+
+
+class TestPrepareAiderInput(unittest.TestCase):
+    """Tests for building the Aider prompt."""
+
+    def test_full_prompt(self):
+        """All sections are rendered in order."""
+        assert prepare_aider_input(ISSUE_DETAILS) == (
+            "# Issue #1: Fix the bug in app.py\n\n"
+            "## Description\n"
+            "There's a bug in app.py that causes an error when processing webhooks.\n\n"
+            "## Analysis\n"
+            "### Affected files\n"
+            "- app.py\n"
+            "\n"
+            "### Error messages\n"
+            "```\nKeyError: 'action'\n```\n"
+            "\n"
+            "## Instructions\n"
+            "Please fix this issue based on the description and analysis above. "
+            "Implement the minimal changes needed to resolve the problem. "
+            "After making changes, explain what you did and why.\n"
+        )
+
+    def test_prompt_without_analysis(self):
+        """Empty analysis sections are omitted."""
+        prompt = prepare_aider_input({**ISSUE_DETAILS, "file_paths": [], "error_messages": []})
+        assert "### Affected files" not in prompt
+        assert "### Error messages" not in prompt
+        assert "## Analysis\n## Instructions\n" in prompt
+
+    def test_prompt_is_cached(self):
+        """The same issue content reuses the previously built prompt."""
+        first = prepare_aider_input(dict(ISSUE_DETAILS))
+        assert prepare_aider_input(dict(ISSUE_DETAILS)) is first
+        changed = prepare_aider_input({**ISSUE_DETAILS, "body": "Another bug"})
+        assert changed is not first
+        assert "Another bug" in changed
+
+
+class TestParseAiderOutput(unittest.TestCase):
+    """Tests for reading changes out of Aider's output."""
+
+    def test_consecutive_edits(self):
+        """Every edited file is captured, without its '---' header."""
+        output = (
+            "Edited 'a.py':\n--- a/a.py\n+++ b/a.py\n@@ -1 +1 @@\n-x\n+y\n"
+            "Edited 'b.py':\n+++ b/b.py\n@@ -1 +1 @@\n-p\n+q\n"
+        )
+        changes, _ = parse_aider_output(output)
+        assert changes == {
+            "a.py": "+++ b/a.py\n@@ -1 +1 @@\n-x\n+y",
+            "b.py": "+++ b/b.py\n@@ -1 +1 @@\n-p\n+q",
+        }
+
+
+if __name__ == "__main__":
+    unittest.main()
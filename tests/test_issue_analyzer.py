@@ -0,0 +1,93 @@
+"""
+Unit tests for the issue analyzer.
+"""
+import unittest
+
+from src.analysis.issue_analyzer import (
+    analyze_issue,
+    determine_issue_type,
+    extract_code_blocks,
+    extract_error_messages,
+    extract_file_paths,
+)
+
+
+BUG_REPORT = """
+The webhook handler crashes in `src/app.py` when the payload has no action.
+
+Steps to reproduce:
+1. Send a webhook without an action field
+2. Watch the server logs
+
+```python
+Traceback (most recent call last):
+  File "src/app.py", line 103, in webhook
+KeyError: 'action'
+```
+
+Error: KeyError raised from the webhook function name lookup
+"""
+
+
+class TestIssueAnalyzer(unittest.TestCase):
+    """Tests for the issue analysis helpers."""
+
+    def test_extract_file_paths(self):
+        """File paths are found and common false positives are dropped."""
+        text = "See in `src/app.py` and file: 'config.yml' at https://example.com v1.0 "
+        file_paths = extract_file_paths(text)
+        assert "src/app.py" in file_paths
+        assert "config.yml" in file_paths
+        assert not any(path.startswith("http") for path in file_paths)
+        assert "v1.0" not in file_paths
+
+    def test_extract_file_paths_order(self):
+        """File paths are deduplicated and returned in document order."""
+        text = "Broken in `b.py`, then in `a.py`, and again in `b.py`"
+        assert extract_file_paths(text) == ["b.py", "a.py"]
+
+    def test_extract_file_paths_labelled(self):
+        """A labelled file path stops at whitespace, leaving the rest of the text to match."""
+        text = "See file: src/a.py and b.py for details"
+        assert extract_file_paths(text) == ["src/a.py", "b.py"]
+
+    def test_extract_error_messages(self):
+        """Error lines and code blocks with tracebacks are extracted."""
+        error_messages = extract_error_messages(BUG_REPORT)
+        assert any("KeyError" in error for error in error_messages)
+
+    def test_extract_code_blocks(self):
+        """Fenced code blocks are extracted without their fences."""
+        code_blocks = extract_code_blocks(BUG_REPORT)
+        assert len(code_blocks) == 1
+        assert code_blocks[0].startswith("Traceback")
+
+    def test_determine_issue_type(self):
+        """Keyword counts decide the issue type, defaulting to bug."""
+        assert determine_issue_type(BUG_REPORT) == "bug"
+        assert determine_issue_type("Feature request: add a new enhancement") == "feature"
+        assert determine_issue_type("Question: how to configure this?") == "question"
+        assert determine_issue_type("") == "bug"
+
+    def test_determine_issue_type_unicode_case(self):
+        """Unicode case variants of keywords do not break the keyword count."""
+        assert determine_issue_type("the app craſh") == "bug"
+        assert determine_issue_type("Fİx faİl") == "bug"
+
+    def test_analyze_issue(self):
+        """A specific, reproducible bug report is considered fixable."""
+        result = analyze_issue(BUG_REPORT)
+        assert result["issue_type"] == "bug"
+        assert "src/app.py" in result["file_paths"]
+        assert result["is_fixable"]
+
+    def test_analyze_feature_request(self):
+        """Feature requests are never considered fixable."""
+        result = analyze_issue("Feature request: please add a new enhancement for dark mode")
+        assert result["issue_type"] == "feature"
+        assert result["fix_potential"] == 0.0
+        assert not result["is_fixable"]
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+"""
+Unit tests for pushing the files changed by Aider.
+"""
+import asyncio
+import base64
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+from git import Repo
+
+from src.github.issues import _is_inside_worktree, push_changes
+
+
+class TestPushChanges(unittest.TestCase):
+    """Tests for selecting and uploading the changed files."""
+
+    def setUp(self):
+        """Create a working tree with a secret file next to it."""
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+
+        self.secret_path = os.path.join(self._tmp.name, "secret.pem")
+        self._write(self.secret_path, "PRIVATE KEY\n")
+
+        self.repo_path = os.path.join(self._tmp.name, "worktree")
+        repo = Repo.init(self.repo_path)
+        self._write(os.path.join(self.repo_path, "app.py"), "print('v1')\n")
+        self._write(os.path.join(self.repo_path, "old.py"), "print('old')\n")
+        repo.index.add(["app.py", "old.py"])
+        repo.index.commit("Initial commit")
+
+    def _write(self, path, content):
+        """Write a text file."""
+        with open(path, "w") as f:
+            f.write(content)
+
+    def test_rejects_paths_outside_worktree(self):
+        """Test that relative, absolute and symlinked paths cannot escape the working tree."""
+        os.symlink(self.secret_path, os.path.join(self.repo_path, "leak.pem"))
+
+        self.assertTrue(_is_inside_worktree(self.repo_path, "app.py"))
+        self.assertFalse(_is_inside_worktree(self.repo_path, "../secret.pem"))
+        self.assertFalse(_is_inside_worktree(self.repo_path, self.secret_path))
+        self.assertFalse(_is_inside_worktree(self.repo_path, "leak.pem"))
+        self.assertFalse(_is_inside_worktree(self.repo_path, "missing.py"))
+
+    def test_uploads_files_changed_in_git(self):
+        """Test that only the files git reports as changed are uploaded."""
+        self._write(os.path.join(self.repo_path, "app.py"), "print('v2')\n")
+        self._write(os.path.join(self.repo_path, "new.py"), "print('new')\n")
+        os.remove(os.path.join(self.repo_path, "old.py"))
+        os.symlink(self.secret_path, os.path.join(self.repo_path, "leak.pem"))
+
+        repository = MagicMock()
+        repository.create_git_blob.return_value.sha = "fedcba9876543210"
+        repository.create_git_commit.return_value.sha = "0123456789abcdef"
+        sha = asyncio.run(push_changes(repository, self.repo_path, "fix/issue-1", "Fix #1"))
+
+        self.assertEqual(sha, "0123456789abcdef")
+        uploaded = sorted(
+            base64.b64decode(call.args[0]).decode()
+            for call in repository.create_git_blob.call_args_list
+        )
+        self.assertEqual(uploaded, ["print('new')\n", "print('v2')\n"])
+
+    def test_no_changes(self):
+        """Test that nothing is pushed when the working tree is clean."""
+        repository = MagicMock()
+        sha = asyncio.run(push_changes(repository, self.repo_path, "fix/issue-1", "Fix #1"))
+
+        self.assertIsNone(sha)
+        repository.create_git_ref.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+"""
+Unit tests for the background worker.
+"""
+import asyncio
+import unittest
+
+from src.worker import Worker
+
+
+class TestWorker(unittest.TestCase):
+    """Tests for running queued jobs in the background."""
+
+    def test_jobs_run_in_order(self):
+        """Queued jobs run in order, and a failing job does not stop the worker."""
+        handled = []
+
+        async def handler(job):
+            if job == "bad":
+                raise ValueError(job)
+            handled.append(job)
+
+        async def run():
+            worker = Worker(handler, "test")
+            for job in ("a", "bad", "b"):
+                worker.enqueue(job)
+            assert handled == []
+            await worker.join()
+            await worker.stop()
+
+        asyncio.run(run())
+        assert handled == ["a", "b"]
+
+    def test_jobs_run_concurrently(self):
+        """Up to `concurrency` jobs are handled at the same time."""
+        running = []
+        peak = []
+
+        async def handler(job):
+            running.append(job)
+            peak.append(len(running))
+            await asyncio.sleep(0.01)
+            running.remove(job)
+
+        async def run():
+            worker = Worker(handler, "test", concurrency=2)
+            for job in range(5):
+                worker.enqueue(job)
+            await worker.join()
+            await worker.stop()
+
+        asyncio.run(run())
+        assert max(peak) == 2
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+"""
+Unit tests for the git workspace manager.
+"""
+import asyncio
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from git import Repo
+
+from src.git.workspace import WorkspaceManager
+
+
+class TestWorkspaceManager(unittest.TestCase):
+    """Tests for cached clones and worktrees."""
+
+    def setUp(self):
+        """Create an upstream repository and an empty cache."""
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+
+        self.upstream_path = os.path.join(self._tmp.name, "upstream")
+        self.upstream = Repo.init(self.upstream_path, initial_branch="main")
+        self._commit("app.py", "print('v1')\n")
+
+        self.manager = WorkspaceManager(os.path.join(self._tmp.name, "cache"))
+
+    def _commit(self, file_name, content):
+        """Commit a file to the upstream repository."""
+        with open(os.path.join(self.upstream_path, file_name), "w") as f:
+            f.write(content)
+        self.upstream.index.add([file_name])
+        return self.upstream.index.commit(
+            f"Update {file_name}",
+            author_date="2023-01-01T00:00:00",
+            commit_date="2023-01-01T00:00:00",
+        ).hexsha
+
+    def _read(self, path, file_name):
+        with open(os.path.join(path, file_name)) as f:
+            return f.read()
+
+    def test_worktree_checks_out_branch(self):
+        """The worktree contains the branch and is removed afterwards."""
+        with self.manager.worktree("owner", "repo", self.upstream_path, "main") as path:
+            assert self._read(path, "app.py") == "print('v1')\n"
+            assert os.path.exists(os.path.join(path, ".git"))
+
+        assert not os.path.exists(path)
+        assert os.path.isdir(self.manager.mirror_path("owner", "repo"))
+
+    def test_cache_is_reused_and_updated(self):
+        """Later worktrees fetch new commits into the existing cache."""
+        with self.manager.worktree("owner", "repo", self.upstream_path, "main"):
+            pass
+
+        sha = self._commit("app.py", "print('v2')\n")
+
+        assert self.manager.update("owner", "repo", self.upstream_path, "main") == sha
+        with self.manager.worktree("owner", "repo", self.upstream_path, "main") as path:
+            assert self._read(path, "app.py") == "print('v2')\n"
+
+    def test_credentials_are_not_stored(self):
+        """Credentials in the clone URL are not written to the cache's config."""
+        clone_url = f"file://x-access-token:secret@{self.upstream_path}"
+        with self.manager.worktree("owner", "repo", clone_url, "main") as path:
+            assert self._read(path, "app.py") == "print('v1')\n"
+
+        mirror = Repo(self.manager.mirror_path("owner", "repo"))
+        assert mirror.remote("origin").url == f"file://{self.upstream_path}"
+        with open(os.path.join(mirror.git_dir, "config")) as f:
+            assert "secret" not in f.read()
+
+    def test_concurrent_worktrees(self):
+        """Jobs for the same repository can check out worktrees at the same time."""
+        def check_out(_):
+            path = self.manager.add_worktree("owner", "repo", self.upstream_path, "main")
+            try:
+                return self._read(path, "app.py")
+            finally:
+                self.manager.remove_worktree("owner", "repo", path)
+
+        with ThreadPoolExecutor(4) as pool:
+            assert list(pool.map(check_out, range(8))) == ["print('v1')\n"] * 8
+
+    def test_worktree_async(self):
+        """The async worktree checks out the branch on the git thread pool."""
+        async def check_out():
+            async with self.manager.worktree_async(
+                "owner", "repo", self.upstream_path, "main"
+            ) as path:
+                return path, self._read(path, "app.py")
+
+        path, content = asyncio.run(check_out())
+        assert content == "print('v1')\n"
+        assert not os.path.exists(path)
+
+
+if __name__ == "__main__":
+    unittest.main()